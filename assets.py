@@ -0,0 +1,95 @@
+"""Chargement asynchrone des images avec un cache disque des sprites redimensionnés
+
+Les images sont lues et redimensionnées sur un pool de threads pendant que la
+carte est chargée. Chaque sprite redimensionné est écrit dans le cache, sous
+un nom dérivé du contenu du fichier et des paramètres de taille : les
+lancements suivants projettent directement les pixels en mémoire (mmap).
+"""
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+CACHE_DIR = os.path.join(".cache", "sprites")
+CACHE_MAGIC = b"HSPR"
+_HEADER = struct.Struct("<4sII")  # Magique, largeur, hauteur (puis pixels RGBA)
+
+
+class AssetLoader:
+    def __init__(self, cache_dir=CACHE_DIR, workers=4):
+        self.cache_dir = cache_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.pending = {}  # nom -> Future
+
+    def request(self, name, filename, variant, size_fn):
+        """Demande le chargement d'une image redimensionnée en arrière-plan
+
+        `variant` identifie les paramètres de taille (par exemple l'échelle) dans
+        la clé du cache, `size_fn(largeur, hauteur)` renvoie la taille cible.
+        """
+        self.pending[name] = self.executor.submit(self._load, filename, variant, size_fn)
+
+    def get(self, name):
+        """Attend et renvoie le sprite demandé (None si l'image n'a pas pu être chargée)"""
+        try:
+            surface = self.pending.pop(name).result()
+        except (pygame.error, OSError, ValueError) as e:
+            print(f"Impossible de charger le sprite {name}: {e}")
+            return None
+        # La conversion au format de l'écran doit se faire dans le thread principal
+        return surface.convert_alpha()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cache_path(self, data, variant):
+        digest = hashlib.sha1(data).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{digest}_{variant}.raw")
+
+    def _load(self, filename, variant, size_fn):
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        cache_path = self._cache_path(data, variant)
+        surface = self._read_cache(cache_path)
+        if surface is not None:
+            return surface
+
+        image = pygame.image.load(io.BytesIO(data), filename)
+        size = size_fn(*image.get_size())
+        surface = pygame.transform.scale(image, (int(size[0]), int(size[1])))
+        self._write_cache(cache_path, surface)
+        return surface
+
+    def _read_cache(self, path):
+        """Lit un sprite du cache par projection mémoire (None si absent ou invalide)"""
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, width, height = _HEADER.unpack_from(mm)
+                if magic != CACHE_MAGIC or len(mm) != _HEADER.size + width * height * 4:
+                    return None
+                # frombuffer partage la mémoire : copier avant de fermer la projection
+                pixels = memoryview(mm)[_HEADER.size:]
+                try:
+                    return pygame.image.frombuffer(pixels, (width, height), "RGBA").copy()
+                finally:
+                    pixels.release()
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def _write_cache(self, path, surface):
+        """Écrit les pixels RGBA du sprite dans le cache (écriture atomique)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(_HEADER.pack(CACHE_MAGIC, *surface.get_size()))
+                f.write(pygame.image.tobytes(surface, "RGBA"))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Impossible d'écrire le cache {path}: {e}")
@@ -0,0 +1,276 @@
+"""Ensemble de villages indépendants simulés en même temps avec des tableaux NumPy
+
+Inspiré des environnements vectorisés de gym : N mondes partagent une seule
+carte en lecture seule, chaque pas les fait tous avancer avec des opérations
+sur des tableaux (mondes x villageois) et renvoie leurs observations empilées.
+
+Les règles sont celles de main.py ramenées à l'échelle de la tuile : un
+villageois agit quand son échéance est atteinte (reproduction, puis carotte la
+plus proche, sinon mouvement aléatoire, avec 10 % de mouvements aléatoires),
+puis attend la durée d'un déplacement et d'une pause.
+"""
+import time
+
+import numpy as np
+
+from tiles import DIRECTIONS, WALKABLE, load_map
+
+# Règles reprises de main.py
+REPRODUCTION_CARROTS = 5  # Carottes nécessaires (et consommées) pour se reproduire
+REPRODUCTION_DELAY = 300  # Délai avant une nouvelle reproduction
+REPRODUCTION_DISTANCE = 2  # Distance de Manhattan maximale entre les partenaires
+GROW_UP_CARROTS = 3  # Carottes qu'un bébé doit manger pour grandir
+RANDOM_MOVE_PROBABILITY = 0.1
+ACTION_DELAY = (45, 105)  # Durée d'un déplacement d'une tuile suivi d'une pause (en pas)
+BLOCKED_DELAY = (10, 20)
+
+OBSERVATIONS = ("population", "babies", "carrots", "carrots_held")
+
+STEPS = np.array(DIRECTIONS)  # Les 8 directions de tiles.py, en tableau
+
+
+class VillageEnsemble:
+    def __init__(self, num_worlds, map_file="map/map.txt", seed=None, villagers=3, max_agents=64,
+                 max_carrots=5, carrot_spawn_interval=180):
+        grid = load_map(map_file)
+        if not grid:
+            raise ValueError(f"carte vide: {map_file}")
+
+        self.num_worlds = num_worlds
+        self.rows, self.cols = len(grid), len(grid[0])
+        # Carte partagée par tous les mondes, en lecture seule
+        ids = np.frombuffer(b"".join(grid), dtype=np.uint8).reshape(self.rows, self.cols)
+        self.walkable = np.frombuffer(WALKABLE, dtype=np.uint8)[ids].astype(bool)
+        self.walkable.flags.writeable = False
+        self.walkable_tiles = np.argwhere(self.walkable)
+        if not len(self.walkable_tiles):
+            raise ValueError(f"aucune tuile marchable dans {map_file}")
+
+        self.rng = np.random.default_rng(seed)
+        self.villagers = villagers
+        # Emplacements par monde au départ : comme main.py n'a pas de limite de population, les
+        # tableaux par villageois doublent dès qu'une naissance ne trouve plus de place
+        self.max_agents = max(max_agents, villagers)
+
+        # Paramètres des carottes, éventuellement différents pour chaque monde
+        self.max_carrots = np.broadcast_to(np.asarray(max_carrots, dtype=np.int64), (num_worlds,)).copy()
+        self.carrot_spawn_interval = np.broadcast_to(
+            np.asarray(carrot_spawn_interval, dtype=np.int64), (num_worlds,)).copy()
+        self.carrot_slots = int(self.max_carrots.max())
+
+        self.reset()
+
+    def reset(self):
+        """Réinitialise tous les mondes et renvoie les observations"""
+        n, a, c = self.num_worlds, self.max_agents, self.carrot_slots
+
+        self.alive = np.zeros((n, a), dtype=bool)
+        self.pos = np.zeros((n, a, 2), dtype=np.int64)
+        self.baby = np.zeros((n, a), dtype=bool)
+        self.carrots_held = np.zeros((n, a), dtype=np.int64)
+        self.age_carrots = np.zeros((n, a), dtype=np.int64)
+        # Pas auxquels chaque villageois agira / pourra de nouveau se reproduire
+        # (des échéances plutôt que des timers : rien à décrémenter à chaque pas)
+        self.next_action = self.rng.integers(0, 61, size=(n, a))
+        self.reproduction_ready = np.zeros((n, a), dtype=np.int64)
+
+        self.carrot_alive = np.zeros((n, c), dtype=bool)
+        self.carrot_pos = np.zeros((n, c, 2), dtype=np.int64)
+        self.carrot_spawn_timer = np.zeros(n, dtype=np.int64)
+
+        self.alive[:, :self.villagers] = True
+        self.pos[:, :self.villagers] = self._random_tiles((n, self.villagers))
+        self.tick = 0
+        return self.observe()
+
+    def observe(self):
+        """Observations empilées (mondes x OBSERVATIONS)"""
+        # Les emplacements libres restent à zéro : pas besoin de masquer par `alive`
+        return np.stack([
+            self.alive.sum(axis=1),
+            self.baby.sum(axis=1),
+            self.carrot_alive.sum(axis=1),
+            self.carrots_held.sum(axis=1),
+        ], axis=1)
+
+    def step(self):
+        """Fait avancer tous les mondes d'un pas et renvoie les observations"""
+        self.tick += 1
+        self._spawn_carrots()
+
+        acting = self.alive & (self.next_action <= self.tick)
+        if acting.any():
+            self._act(acting)
+        return self.observe()
+
+    def _random_tiles(self, shape):
+        return self.walkable_tiles[self.rng.integers(0, len(self.walkable_tiles), size=shape)]
+
+    def _spawn_carrots(self):
+        self.carrot_spawn_timer += 1
+        spawning = ((self.carrot_spawn_timer >= self.carrot_spawn_interval) &
+                    (self.carrot_alive.sum(axis=1) < self.max_carrots))
+        worlds = np.flatnonzero(spawning)
+        if not len(worlds):
+            return
+        slots = np.argmin(self.carrot_alive[worlds], axis=1)  # Premier emplacement libre
+        tiles = self._random_tiles(len(worlds))
+        self.carrot_alive[worlds, slots] = True
+        self.carrot_pos[worlds, slots] = tiles
+        self.carrot_spawn_timer[worlds] = 0
+
+        # Une carotte qui apparaît sous un villageois est mangée tout de suite
+        under = self.alive[worlds] & (self.pos[worlds] == tiles[:, None, :]).all(axis=2)
+        eaten = under.any(axis=1)
+        if eaten.any():
+            self.carrot_alive[worlds[eaten], slots[eaten]] = False
+            self._feed(worlds[eaten], np.argmax(under[eaten], axis=1))
+
+    def _eat_carrots(self, worlds, agents):
+        """Les villageois qui viennent d'arriver sur une carotte la mangent (le premier l'emporte)"""
+        on_carrot = (self.carrot_alive[worlds] &
+                     (self.carrot_pos[worlds] == self.pos[worlds, agents][:, None, :]).all(axis=2))
+        movers, carrots = np.nonzero(on_carrot)
+        if not len(movers):
+            return
+        _, first = np.unique(worlds[movers] * self.carrot_slots + carrots, return_index=True)
+        movers, carrots = movers[first], carrots[first]
+        self.carrot_alive[worlds[movers], carrots] = False
+        self._feed(worlds[movers], agents[movers])
+
+    def _feed(self, worlds, agents):
+        """Donne une carotte à chaque villageois ; les bébés grandissent après GROW_UP_CARROTS"""
+        np.add.at(self.carrots_held, (worlds, agents), 1)
+        np.add.at(self.age_carrots, (worlds, agents), self.baby[worlds, agents].astype(np.int64))
+        self.baby[worlds, agents] &= self.age_carrots[worlds, agents] < GROW_UP_CARROTS
+
+    def _act(self, acting):
+        """Fait agir les villageois dont l'échéance est atteinte (tableaux de taille K = nombre d'acteurs)"""
+        worlds, agents = np.nonzero(acting)
+        count = len(worlds)
+        rows = np.arange(count)
+        pos = self.pos[worlds, agents]
+        unreachable = np.iinfo(np.int64).max
+
+        # PRIORITÉ 1 : REPRODUCTION - partenaire éligible le plus proche dans le même monde
+        candidates = self.alive[worlds] & ~self.baby[worlds]
+        candidates &= self.carrots_held[worlds] >= REPRODUCTION_CARROTS
+        candidates &= self.reproduction_ready[worlds] <= self.tick
+        distance = np.abs(self.pos[worlds] - pos[:, None, :]).sum(axis=2)
+        partner_distance = np.where(candidates, distance, unreachable)
+        partner_distance[rows, agents] = unreachable
+        partner = np.argmin(partner_distance, axis=1)
+        partner_distance = partner_distance[rows, partner]
+        has_partner = candidates[rows, agents] & (partner_distance < unreachable)
+
+        couples = has_partner & (partner_distance <= REPRODUCTION_DISTANCE)
+        if couples.any():
+            # Un villageois ne participe qu'à un seul couple par pas
+            first = worlds * self.max_agents + agents
+            second = worlds * self.max_agents + partner
+            low, high = np.minimum(first, second), np.maximum(first, second)
+            # Un couple réciproque (A choisit B et B choisit A) n'est compté qu'une fois
+            _, unique = np.unique(low[couples] * (self.num_worlds * self.max_agents) + high[couples],
+                                  return_index=True)
+            chosen = np.flatnonzero(couples)[unique]
+            keys, counts = np.unique(np.concatenate([low[chosen], high[chosen]]), return_counts=True)
+            chosen = chosen[np.isin(low[chosen], keys[counts == 1]) & np.isin(high[chosen], keys[counts == 1])]
+            self._reproduce(worlds[chosen], agents[chosen], partner[chosen])
+            couples = np.isin(first, np.concatenate([low[chosen], high[chosen]]))
+            has_partner &= ~couples
+
+        # PRIORITÉ 2 : CAROTTE LA PLUS PROCHE (sinon mouvement aléatoire)
+        carrot_alive = self.carrot_alive[worlds]
+        carrot_distance = np.abs(self.carrot_pos[worlds] - pos[:, None, :]).sum(axis=2)
+        nearest_carrot = np.argmin(np.where(carrot_alive, carrot_distance, unreachable), axis=1)
+        has_carrot = carrot_alive.any(axis=1)
+
+        target = np.where(has_partner[:, None], self.pos[worlds, partner],
+                          self.carrot_pos[worlds, nearest_carrot])
+        seeking = has_partner | has_carrot
+        random_move = ~seeking | (self.rng.random(count) < RANDOM_MOVE_PROBABILITY)
+
+        # Direction vers la cible, puis les deux alternatives de path_to_carrot
+        step = np.sign(target - pos)
+        random_step = STEPS[self.rng.integers(0, len(STEPS), size=count)]
+        options = [
+            np.where(random_move[:, None], random_step, step),
+            np.where(random_move[:, None], 0, step * [1, 0]),
+            np.where(random_move[:, None], 0, step * [0, 1]),
+        ]
+
+        # Tuiles occupées au début du pas (clé monde/tuile triée pour une recherche binaire)
+        tiles = self.rows * self.cols
+        alive_worlds, alive_agents = np.nonzero(self.alive)
+        occupied = np.sort(alive_worlds * tiles + self.pos[alive_worlds, alive_agents, 0] * self.cols +
+                           self.pos[alive_worlds, alive_agents, 1])
+
+        moved = couples.copy()  # Un couple qui vient de se reproduire ne bouge pas
+        for option in options:
+            destination = pos + option
+            valid = (~moved & option.any(axis=1) &
+                     (destination[:, 0] >= 0) & (destination[:, 0] < self.rows) &
+                     (destination[:, 1] >= 0) & (destination[:, 1] < self.cols))
+            di = np.clip(destination[:, 0], 0, self.rows - 1)
+            dj = np.clip(destination[:, 1], 0, self.cols - 1)
+            key = worlds * tiles + di * self.cols + dj
+            index = np.minimum(np.searchsorted(occupied, key), len(occupied) - 1)
+            valid &= self.walkable[di, dj] & (occupied[index] != key)
+            pos[valid] = destination[valid]
+            moved |= valid
+        moved &= ~couples
+        self.pos[worlds, agents] = pos
+        if moved.any():
+            self._eat_carrots(worlds[moved], agents[moved])
+
+        delay = np.where(moved, self.rng.integers(*ACTION_DELAY, size=count),
+                         self.rng.integers(*BLOCKED_DELAY, size=count))
+        self.next_action[worlds, agents] = self.tick + delay
+
+    def _grow(self, agents):
+        """Agrandit les tableaux par villageois de tous les mondes à `agents` emplacements"""
+        extra = agents - self.max_agents
+        for name in ("alive", "pos", "baby", "carrots_held", "age_carrots", "next_action", "reproduction_ready"):
+            array = getattr(self, name)
+            padding = np.zeros((self.num_worlds, extra) + array.shape[2:], dtype=array.dtype)
+            setattr(self, name, np.concatenate([array, padding], axis=1))
+        self.max_agents = agents
+
+    def _reproduce(self, worlds, first, second):
+        """Consomme les carottes des couples et fait naître un bébé sur la tuile d'un parent"""
+        for parent in (first, second):
+            self.carrots_held[worlds, parent] -= REPRODUCTION_CARROTS
+            self.reproduction_ready[worlds, parent] = self.tick + REPRODUCTION_DELAY
+
+        # Rang de chaque naissance dans son monde, associé au n-ième emplacement libre
+        sort = np.argsort(worlds, kind="stable")
+        worlds, first, second = worlds[sort], first[sort], second[sort]
+        rank = np.arange(len(worlds)) - np.searchsorted(worlds, worlds)
+        missing = rank - (~self.alive[worlds]).sum(axis=1)
+        if (missing >= 0).any():
+            self._grow(max(2 * self.max_agents, self.max_agents + int(missing.max()) + 1))
+        order = np.argsort(self.alive[worlds], axis=1, kind="stable")  # Emplacements libres en premier
+        slots = order[np.arange(len(worlds)), rank]
+
+        parent = np.where(self.rng.random(len(worlds)) < 0.5, first, second)
+        self.alive[worlds, slots] = True
+        self.baby[worlds, slots] = True
+        self.pos[worlds, slots] = self.pos[worlds, parent]
+        self.carrots_held[worlds, slots] = 0
+        self.age_carrots[worlds, slots] = 0
+        self.reproduction_ready[worlds, slots] = 0
+        self.next_action[worlds, slots] = self.tick + self.rng.integers(0, 61, size=len(worlds))
+
+
+if __name__ == "__main__":
+    # Exemple : 256 villages sur la même carte, avec des quantités de carottes différentes
+    worlds = 256
+    ensemble = VillageEnsemble(worlds, seed=0, max_carrots=np.arange(worlds) % 10 + 1)
+    steps = 5000
+    start = time.perf_counter()
+    for _ in range(steps):
+        observations = ensemble.step()
+    elapsed = time.perf_counter() - start
+    print(f"{worlds} mondes x {steps} pas en {elapsed:.1f} s ({worlds * steps / elapsed:.0f} pas-monde/s)")
+    for name, column in zip(OBSERVATIONS, observations.T):
+        print(f"{name}: moyenne {column.mean():.1f}, min {column.min()}, max {column.max()}")
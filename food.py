@@ -0,0 +1,125 @@
+"""Couche de nourriture par tuile, stockée dans des tableaux NumPy
+
+Remplace les carottes individuelles quand la simulation est lancée avec
+--food-grid : chaque tuile contient une quantité de nourriture qui repousse
+selon son terrain (food_capacity et food_regrowth dans tiles.py).
+
+Un champ de distances donne, pour chaque tuile, le nombre de pas jusqu'à la
+nourriture la plus proche en contournant les obstacles. Il est recalculé
+après la repousse ou quand une tuile est vidée ; un villageois affamé n'a qu'à
+descendre ce champ, sans recherche ni objet par unité de nourriture.
+"""
+import numpy as np
+
+from tiles import DIRECTIONS, FOOD_CAPACITY, FOOD_REGROWTH, WALKABLE
+
+REGROWTH_INTERVAL = 60  # Repousse appliquée toutes les 60 frames (1 seconde à 60 FPS)
+REFRESH_INTERVAL = 10  # Au plus un recalcul du champ de distances toutes les 10 frames
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+def _shifted(array, di, dj, fill):
+    """Renvoie `array` décalé de (di, dj) : result[i, j] = array[i + di, j + dj]"""
+    result = np.full_like(array, fill)
+    rows, cols = array.shape
+    result[max(-di, 0):rows - max(di, 0), max(-dj, 0):cols - max(dj, 0)] = \
+        array[max(di, 0):rows - max(-di, 0), max(dj, 0):cols - max(-dj, 0)]
+    return result
+
+
+class FoodGrid:
+    def __init__(self, grid):
+        self.rows = len(grid)
+        self.cols = len(grid[0])
+        ids = np.frombuffer(b"".join(grid), dtype=np.uint8).reshape(self.rows, self.cols)
+
+        self.walkable = np.frombuffer(WALKABLE, dtype=np.uint8)[ids].astype(bool)
+        self.capacity = np.asarray(FOOD_CAPACITY, dtype=np.float32)[ids] * self.walkable
+        self.regrowth = np.asarray(FOOD_REGROWTH, dtype=np.float32)[ids] * self.walkable
+        self.amount = self.capacity.copy()  # La carte démarre pleine
+
+        self.distance = np.full((self.rows, self.cols), UNREACHABLE, dtype=np.int32)
+        self.dirty = True
+        self.tick = 0
+        self.last_refresh = -REFRESH_INTERVAL
+        self.version = 0  # Incrémenté à chaque recalcul (les tuiles pourvues ont pu changer)
+        self.refresh()
+
+    def total(self):
+        """Nombre d'unités de nourriture entières sur la carte"""
+        return int(np.floor(self.amount).sum())
+
+    def refill(self):
+        """Remplit toutes les tuiles à leur capacité (réinitialisation de la partie)"""
+        self.amount[:] = self.capacity
+        self.dirty = True
+
+    def update_tile(self, i, j, tile_id):
+        """À appeler quand le terrain de la tuile (i, j) change"""
+        walkable = bool(WALKABLE[tile_id])
+        self.walkable[i, j] = walkable
+        self.capacity[i, j] = FOOD_CAPACITY[tile_id] if walkable else 0
+        self.regrowth[i, j] = FOOD_REGROWTH[tile_id] if walkable else 0
+        self.amount[i, j] = min(self.amount[i, j], self.capacity[i, j])
+        self.dirty = True
+
+    def update(self):
+        """Appelé une fois par frame : repousse périodique et recalcul du champ si nécessaire"""
+        self.tick += 1
+        if self.tick % REGROWTH_INTERVAL == 0:
+            before = self.amount >= 1
+            np.minimum(self.amount + self.regrowth * REGROWTH_INTERVAL, self.capacity, out=self.amount)
+            # Le champ ne change que si de la nourriture est apparue sur une tuile vide
+            if ((self.amount >= 1) & ~before).any():
+                self.dirty = True
+        if self.dirty and self.tick - self.last_refresh >= REFRESH_INTERVAL:
+            self.refresh()
+
+    def consume(self, i, j):
+        """Mange une unité de nourriture sur la tuile (i, j) si elle en contient"""
+        if self.amount[i, j] < 1:
+            return False
+        self.amount[i, j] -= 1
+        if self.amount[i, j] < 1:
+            self.dirty = True  # La tuile est vide : les plus proches voisins changent
+        return True
+
+    def reachable(self, i, j):
+        """Vrai si de la nourriture est accessible depuis la tuile (i, j)"""
+        return self.distance[i, j] != UNREACHABLE
+
+    def step_towards(self, i, j):
+        """Tuile voisine qui rapproche de la nourriture la plus proche (None si aucune)"""
+        best = None
+        best_distance = self.distance[i, j]
+        for di, dj in DIRECTIONS:
+            ni, nj = i + di, j + dj
+            if 0 <= ni < self.rows and 0 <= nj < self.cols and self.distance[ni, nj] < best_distance:
+                best = (ni, nj)
+                best_distance = self.distance[ni, nj]
+        return best
+
+    def refresh(self):
+        """Recalcule le champ de distances (parcours en largeur multi-sources vectorisé)
+
+        Toutes les tuiles contenant de la nourriture partent à distance 0, puis
+        le front avance d'un pas dans les 8 directions à chaque itération, en
+        ne traversant que des tuiles marchables.
+        """
+        frontier = self.walkable & (self.amount >= 1)
+        self.distance.fill(UNREACHABLE)
+        self.distance[frontier] = 0
+        unvisited = self.walkable & ~frontier
+        step = 0
+        while frontier.any():
+            step += 1
+            reached = np.zeros_like(frontier)
+            for di, dj in DIRECTIONS:
+                reached |= _shifted(frontier, di, dj, False)
+            reached &= unvisited
+            self.distance[reached] = step
+            unvisited &= ~reached
+            frontier = reached
+        self.dirty = False
+        self.last_refresh = self.tick
+        self.version += 1
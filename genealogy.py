@@ -0,0 +1,140 @@
+"""Généalogie des villageois : registre des naissances en colonnes, ajout seul
+
+Chaque villageois reçoit à sa naissance un identifiant entier stable, qui est
+aussi sa ligne dans des tableaux `array` : parents, pas de naissance, tuile de
+naissance, profondeur de génération et pas de la mort. Le registre ne garde
+aucune référence vers les objets Villageois, qui peuvent être réutilisés par
+le pool après leur mort.
+
+Les identifiants sont attribués dans l'ordre des naissances : les parents
+ont toujours un identifiant plus petit que leurs enfants, ce qui permet de
+remonter tout l'arbre en un seul parcours à rebours. Les enfants de chaque
+villageois forment une liste chaînée dans deux colonnes (une par parent), pour
+descendre l'arbre sans index supplémentaire.
+"""
+import bisect
+import struct
+from array import array
+from collections import deque
+
+NO_PARENT = -1  # Parents d'un fondateur
+ALIVE = 2 ** 31 - 1  # Pas de la mort d'un villageois encore vivant
+
+GENEALOGY_MAGIC = b"HSGEN"
+GENEALOGY_VERSION = 1
+_HEADER = struct.Struct("<5sBI")  # Magique, version, nombre de naissances
+
+# Colonnes du registre (nom, type array) dans l'ordre du fichier
+_COLUMNS = [
+    ("parent_a", 'i'), ("parent_b", 'i'), ("birth_tick", 'i'), ("birth_i", 'H'), ("birth_j", 'H'),
+    ("depth", 'I'), ("death_tick", 'i'), ("first_child", 'i'), ("next_sibling_a", 'i'), ("next_sibling_b", 'i'),
+]
+
+
+class Genealogy:
+    def __init__(self):
+        for name, typecode in _COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.parent_a)
+
+    def record_birth(self, tick, i, j, parents=None):
+        """Enregistre une naissance et renvoie l'identifiant du nouveau villageois"""
+        child = len(self)
+        a, b = parents if parents is not None else (NO_PARENT, NO_PARENT)
+        self.parent_a.append(a)
+        self.parent_b.append(b)
+        self.birth_tick.append(tick)
+        self.birth_i.append(i)
+        self.birth_j.append(j)
+        self.depth.append(1 + max(self.depth[a], self.depth[b]) if parents is not None else 0)
+        self.death_tick.append(ALIVE)
+        self.first_child.append(NO_PARENT)
+        # L'enfant devient la tête de la liste des enfants de chaque parent
+        self.next_sibling_a.append(self.first_child[a] if parents is not None else NO_PARENT)
+        self.next_sibling_b.append(self.first_child[b] if parents is not None else NO_PARENT)
+        if parents is not None:
+            self.first_child[a] = child
+            self.first_child[b] = child
+        return child
+
+    def record_death(self, uid, tick):
+        self.death_tick[uid] = tick
+
+    def parents(self, uid):
+        """Parents de `uid` (liste vide pour un fondateur)"""
+        return [parent for parent in (self.parent_a[uid], self.parent_b[uid]) if parent != NO_PARENT]
+
+    def children(self, uid):
+        """Enfants de `uid`, du plus récent au plus ancien"""
+        child = self.first_child[uid]
+        while child != NO_PARENT:
+            yield child
+            child = self.next_sibling_a[child] if self.parent_a[child] == uid else self.next_sibling_b[child]
+
+    def ancestors(self, uid, max_depth=None):
+        """Ensemble des ancêtres de `uid`, jusqu'à `max_depth` générations au-dessus"""
+        return self._walk(uid, self.parents, max_depth)
+
+    def descendants(self, uid, max_depth=None):
+        """Ensemble des descendants de `uid`, jusqu'à `max_depth` générations en dessous"""
+        return self._walk(uid, self.children, max_depth)
+
+    def generation(self, uid):
+        """Profondeur de génération : 0 pour un fondateur, 1 + la plus grande de ses parents sinon"""
+        return self.depth[uid]
+
+    def alive_at(self, uid, tick):
+        return self.birth_tick[uid] <= tick < self.death_tick[uid]
+
+    def surviving_lineages(self, tick, roots=None):
+        """Villageois de `roots` (les fondateurs par défaut) dont un descendant vit encore au pas `tick`
+
+        Un seul parcours des naissances antérieures à `tick`, des plus récentes
+        aux plus anciennes : chaque villageois vivant ou ayant une descendance
+        vivante marque ses deux parents.
+        """
+        born = bisect.bisect_right(self.birth_tick, tick)
+        flag = bytearray(born)
+        parent_a, parent_b, death_tick = self.parent_a, self.parent_b, self.death_tick
+        for uid in range(born - 1, -1, -1):
+            if flag[uid] or death_tick[uid] > tick:
+                flag[uid] = 1
+                if parent_a[uid] != NO_PARENT:
+                    flag[parent_a[uid]] = 1
+                    flag[parent_b[uid]] = 1
+        if roots is None:
+            roots = (uid for uid in range(born) if parent_a[uid] == NO_PARENT)
+        return [uid for uid in roots if uid < born and flag[uid]]
+
+    def save(self, path):
+        """Écrit le registre dans un fichier (en-tête puis chaque colonne brute)"""
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(GENEALOGY_MAGIC, GENEALOGY_VERSION, len(self)))
+            for name, _ in _COLUMNS:
+                getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        genealogy = cls()
+        with open(path, 'rb') as f:
+            magic, version, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != GENEALOGY_MAGIC or version != GENEALOGY_VERSION:
+                raise ValueError("format de généalogie non reconnu")
+            for name, _ in _COLUMNS:
+                getattr(genealogy, name).fromfile(f, count)
+        return genealogy
+
+    def _walk(self, uid, neighbours, max_depth):
+        found = set()
+        queue = deque([(uid, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for other in neighbours(current):
+                if other not in found:
+                    found.add(other)
+                    queue.append((other, depth + 1))
+        return found
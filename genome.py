@@ -0,0 +1,85 @@
+"""Génome héréditaire des villageois : un octet par gène
+
+Les génomes de toute la population sont rangés ligne par ligne dans une
+colonne `bytearray` du pool des villageois (voir pool.py), dans le même ordre
+que la liste dense des vivants : la population entière s'analyse directement
+sur ces octets, sans parcourir les objets Villageois.
+
+Chaque gène code une valeur entre deux bornes (0 -> minimum, 255 -> maximum),
+sur une échelle linéaire ou logarithmique (chaque octet multiplie alors la
+valeur par le même facteur).
+Le croisement choisit chaque gène chez l'un des deux parents en une seule
+opération sur le génome entier vu comme un entier (masque d'octets), puis
+quelques gènes mutent légèrement.
+"""
+import math
+import random
+from collections import Counter
+
+# Nom, minimum, maximum, valeur des fondateurs (les règles d'origine), valeur entière ?, échelle logarithmique ?
+TRAITS = [
+    ("speed", 0.5, 2.0, 1.0, False, False),  # Vitesse de déplacement (pixels par frame)
+    ("reproduction_threshold", 2, 10, 5, True, False),  # Carottes nécessaires (et consommées) pour se reproduire
+    # Distance maximale (en tuiles) des carottes recherchées : les fondateurs, comme les règles
+    # d'origine, n'ont pas de limite sur une carte jusqu'à 1024x1024
+    ("search_radius", 4, 2048, 2048, True, True),
+    ("wander_probability", 0.0, 0.5, 0.1, False, False),  # Probabilité d'un pas au hasard en chemin
+]
+SPEED, REPRODUCTION_THRESHOLD, SEARCH_RADIUS, WANDER_PROBABILITY = range(len(TRAITS))
+GENES = len(TRAITS)
+
+MUTATION_RATE = 0.2  # Probabilité de mutation de chaque gène à la naissance
+MUTATION_SIGMA = 8  # Écart type d'une mutation (en octets)
+
+
+def encode(trait, value):
+    _, low, high, _, _, logarithmic = TRAITS[trait]
+    if logarithmic:
+        return max(0, min(255, round(math.log(value / low) * 255 / math.log(high / low))))
+    return max(0, min(255, round((value - low) * 255 / (high - low))))
+
+
+def _decode(trait, byte):
+    _, low, high, _, integer, logarithmic = TRAITS[trait]
+    value = low * (high / low) ** (byte / 255) if logarithmic else low + byte * (high - low) / 255
+    return round(value) if integer else value
+
+
+# Valeur de chaque gène pour les 256 octets possibles (lecture directe pendant la simulation)
+VALUES = [[_decode(trait, byte) for byte in range(256)] for trait in range(GENES)]
+
+FOUNDER_GENOME = bytes(encode(trait, TRAITS[trait][3]) for trait in range(GENES))
+
+# Masque d'octets pour chaque choix de parents (bit k à 1 : gène k du premier parent)
+_MASKS = [sum(0xFF << (8 * k) for k in range(GENES) if choice >> k & 1) for choice in range(1 << GENES)]
+_FULL = (1 << (8 * GENES)) - 1
+
+
+def crossover(first, second):
+    """Génome d'un enfant : chaque gène vient d'un des parents, puis mutations"""
+    mask = _MASKS[random.getrandbits(GENES)]
+    a = int.from_bytes(first, 'little')
+    b = int.from_bytes(second, 'little')
+    child = bytearray(((a & mask) | (b & ~mask & _FULL)).to_bytes(GENES, 'little'))
+    for gene in range(GENES):
+        if random.random() < MUTATION_RATE:
+            child[gene] = max(0, min(255, child[gene] + round(random.gauss(0, MUTATION_SIGMA))))
+    return bytes(child)
+
+
+def summary(genomes, bins=8):
+    """Moyenne et histogramme de chaque trait pour une colonne de génomes
+
+    Renvoie {nom: (moyenne, [effectif de chaque tranche])}, les tranches
+    découpant les octets 0 à 255 du gène en `bins` parts égales.
+    """
+    count = len(genomes) // GENES
+    result = {}
+    for trait, (name, *_) in enumerate(TRAITS):
+        total = 0
+        histogram = [0] * bins
+        for byte, n in Counter(genomes[trait::GENES]).items():
+            total += VALUES[trait][byte] * n
+            histogram[min(byte * bins // 255, bins - 1)] += n
+        result[name] = (total / count if count else 0.0, histogram)
+    return result
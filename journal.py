@@ -0,0 +1,158 @@
+"""Journal des actions du joueur pour rejouer une partie à l'identique
+
+La simulation ne dépend que de la graine du module `random` et des actions
+du joueur : le journal enregistre la graine, les réglages de la partie, le pas
+de chaque action et, périodiquement, une empreinte de l'état. Un rejeu sans
+affichage recalcule les empreintes et signale la première qui diffère.
+
+Format (ajout seul) : en-tête (magique, version, graine, réglages en JSON),
+puis des enregistrements (pas, type, données). Les instantanés de l'état
+complet sont écrits à part, dans `<journal>.snap`, pour garder le journal
+compact ; un rejeu peut repartir du plus proche.
+"""
+import copyreg
+import io
+import json
+import pickle
+import struct
+
+JOURNAL_MAGIC = b"HSJRN"
+JOURNAL_VERSION = 1
+_HEADER = struct.Struct("<5sBQI")  # Magique, version, graine, taille des réglages JSON
+_RECORD = struct.Struct("<IB")  # Pas, type d'enregistrement
+_SNAPSHOT = struct.Struct("<II")  # Pas, taille des données
+
+# Types d'enregistrements : actions du joueur, puis enregistrements de contrôle
+INPUT_SPAWN = 1  # Espace : ajouter un villageois
+INPUT_RESET = 2  # R : réinitialiser
+INPUT_CARROT = 3  # C : ajouter une carotte
+INPUT_PAINT = 4  # Clic : peindre une tuile (i, j, terrain)
+RECORD_HASH = 5  # Empreinte de l'état
+RECORD_END = 6  # Fin de la partie
+
+# Données de chaque type d'enregistrement
+_PAYLOADS = {
+    INPUT_SPAWN: struct.Struct("<"),
+    INPUT_RESET: struct.Struct("<"),
+    INPUT_CARROT: struct.Struct("<"),
+    INPUT_PAINT: struct.Struct("<HHB"),
+    RECORD_HASH: struct.Struct("<Q"),
+    RECORD_END: struct.Struct("<"),
+}
+
+
+class JournalWriter:
+    def __init__(self, path, seed, settings):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.snapshots = None  # Fichier des instantanés, ouvert au premier instantané
+        encoded = json.dumps(settings).encode('utf-8')
+        self.file.write(_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, seed, len(encoded)))
+        self.file.write(encoded)
+
+    def record(self, tick, kind, *args):
+        self.file.write(_RECORD.pack(tick, kind))
+        self.file.write(_PAYLOADS[kind].pack(*args))
+
+    def record_hash(self, tick, value):
+        self.record(tick, RECORD_HASH, value)
+        self.file.flush()  # Un journal interrompu reste rejouable jusqu'à la dernière empreinte
+
+    def record_snapshot(self, tick, data):
+        if self.snapshots is None:
+            self.snapshots = open(self.path + ".snap", 'wb')
+        self.snapshots.write(_SNAPSHOT.pack(tick, len(data)))
+        self.snapshots.write(data)
+        self.snapshots.flush()
+
+    def close(self, tick):
+        self.record(tick, RECORD_END)
+        self.file.close()
+        if self.snapshots is not None:
+            self.snapshots.close()
+
+
+class JournalReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, self.seed, size = _HEADER.unpack_from(data)
+        if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+            raise ValueError("format de journal non reconnu")
+        offset = _HEADER.size
+        self.settings = json.loads(data[offset:offset + size].decode('utf-8'))
+        offset += size
+
+        self.inputs = {}  # pas -> [(type, données)] dans l'ordre d'enregistrement
+        self.hashes = {}  # pas -> empreinte
+        self.end_tick = 0
+        while offset + _RECORD.size <= len(data):
+            tick, kind = _RECORD.unpack_from(data, offset)
+            payload = _PAYLOADS.get(kind)
+            if payload is None or offset + _RECORD.size + payload.size > len(data):
+                break  # Fin tronquée d'un journal interrompu
+            args = payload.unpack_from(data, offset + _RECORD.size)
+            offset += _RECORD.size + payload.size
+            if kind == RECORD_HASH:
+                self.hashes[tick] = args[0]
+            elif kind != RECORD_END:
+                self.inputs.setdefault(tick, []).append((kind, args))
+            self.end_tick = max(self.end_tick, tick)
+
+    def snapshot_before(self, tick):
+        """Renvoie (pas, données) de l'instantané le plus récent au plus tard à `tick`, ou None"""
+        try:
+            with open(self.path + ".snap", 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        best = None
+        offset = 0
+        while offset + _SNAPSHOT.size <= len(data):
+            snapshot_tick, size = _SNAPSHOT.unpack_from(data, offset)
+            offset += _SNAPSHOT.size
+            if offset + size > len(data) or snapshot_tick > tick:
+                break
+            best = (snapshot_tick, offset, size)
+            offset += size
+        if best is None:
+            return None
+        snapshot_tick, offset, size = best
+        return snapshot_tick, data[offset:offset + size]
+
+
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, named, full_state_types):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.names = {id(obj): name for name, obj in named.items()}
+        self.full_state_types = full_state_types
+
+    def persistent_id(self, obj):
+        return self.names.get(id(obj))
+
+    def reducer_override(self, obj):
+        # Ces objets sont sauvegardés avec tous leurs attributs, sans passer par __getstate__
+        if isinstance(obj, self.full_state_types):
+            return copyreg.__newobj__, (type(obj),), obj.__dict__
+        return NotImplemented
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, named):
+        super().__init__(file)
+        self.named = named
+
+    def persistent_load(self, name):
+        return self.named[name]
+
+
+def dump_snapshot(state, named, full_state_types=()):
+    """Sérialise `state` ; les objets de `named` (sprites...) sont désignés par leur nom"""
+    buffer = io.BytesIO()
+    _SnapshotPickler(buffer, named, full_state_types).dump(state)
+    return buffer.getvalue()
+
+
+def load_snapshot(data, named):
+    return _SnapshotUnpickler(io.BytesIO(data), named).load()
@@ -1,72 +1,70 @@
-import pygame
-import sys
-import random
+import argparse
+import bisect
+import hashlib
 import math
+import os
+import random
+import sys
+import time
+from array import array
 
-pygame.init()
+import pygame
 
-WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Villageois sur carte isométrique personnalisée")
+from assets import AssetLoader
+from genealogy import NO_PARENT, Genealogy
+from genome import (FOUNDER_GENOME, GENES, REPRODUCTION_THRESHOLD, SEARCH_RADIUS, SPEED, VALUES,
+                    WANDER_PROBABILITY, crossover, summary)
+from journal import (INPUT_CARROT, INPUT_PAINT, INPUT_RESET, INPUT_SPAWN, JournalReader, JournalWriter,
+                     dump_snapshot, load_snapshot)
+from metrics import Metrics
+from pool import Pool
+from recorder import FrameRecorder
+from regions import RegionMap
+from shard import run_sharded
+from stream import StreamServer
+from tiles import TILE_TYPES, TILE_BY_CHAR, WALKABLE, MOVEMENT_COST, EMPTY, DIRECTIONS, load_map
 
-clock = pygame.time.Clock()
+WINDOW_WIDTH, WINDOW_HEIGHT = 800, 600
+BACKGROUND_COLOR = (40, 60, 80)
+screen = None  # Surface d'affichage, créée dans main()
 
 # Configuration de la carte isométrique (sera redéfinie après chargement)
 MAP_ROWS = 0
 MAP_COLS = 0
 
 scale = 100
-terrain_map = []  # Matrice contenant les types de terrain
+terrain_map = []  # Lignes (bytearray) d'identifiants de terrain, voir tiles.py
+regions = None  # Connexité de la carte et graphe de régions, voir regions.py
+
+# Tuiles repeintes depuis la dernière diffusion (--stream-port, voir stream.py), None sans diffusion
+painted_tiles = None
+
+# Carte pré-dessinée et arbres à dessiner (voir bake_terrain), mis à jour tuile par tuile
+terrain_surface = None
+tree_entries = {}  # (i, j) -> (sprite, position)
+tree_order = []  # Clés de tree_entries dans l'ordre de dessin
 
 # Décalage pour centrer la map
 offset_x = WINDOW_WIDTH // 2
 offset_y = 0
 
-# Types de terrain et leurs fichiers d'images
-TERRAIN_TYPES = {
-    '.': None,  # Vide (pas de tuile)
-    'G': 'img/herbe.png',  # Herbe
-    'S': 'img/sable.png',  # Sable
-    'W': 'img/eau.png',  # Eau
-    'R': 'img/roche.png',  # Roche/Terre
-    'T': 'img/arbre.png',  # Arbre
-    'B': 'img/bloc.png',  # Bloc (ajouté comme exemple)
-}
-
-
 def load_map_from_file(filename):
-    """Charge une carte depuis un fichier texte"""
-    global MAP_ROWS, MAP_COLS, terrain_map
+    """Charge une carte depuis un fichier texte ou binaire (voir tiles.py)"""
+    global MAP_ROWS, MAP_COLS, terrain_map, regions
 
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        # Nettoyer les lignes et enlever les espaces/retours à la ligne
-        lines = [line.rstrip() for line in lines if line.strip()]
+        grid = load_map(filename)
 
-        if not lines:
+        if not grid:
             print(f"Fichier {filename} vide, utilisation de la carte par défaut")
             create_default_map()
             return
 
-        MAP_ROWS = len(lines)
-        MAP_COLS = max(len(line) for line in lines)
-
-        # Créer la matrice de terrain
-        terrain_map = []
-        for i, line in enumerate(lines):
-            row = []
-            for j in range(MAP_COLS):
-                if j < len(line):
-                    char = line[j]
-                    if char in TERRAIN_TYPES:
-                        row.append(char)
-                    else:
-                        row.append('.')  # Caractère inconnu = vide
-                else:
-                    row.append('.')  # Compléter avec du vide
-            terrain_map.append(row)
+        terrain_map = grid
+        MAP_ROWS = len(grid)
+        MAP_COLS = len(grid[0])
+        regions = RegionMap(terrain_map)
+        census.clear(MAP_ROWS, MAP_COLS)
 
         print(f"Carte chargée: {MAP_ROWS}x{MAP_COLS}")
 
@@ -80,7 +78,7 @@ def load_map_from_file(filename):
 
 def create_default_map():
     """Crée une carte par défaut si le fichier n'est pas trouvé"""
-    global MAP_ROWS, MAP_COLS, terrain_map
+    global MAP_ROWS, MAP_COLS, terrain_map, regions
 
     MAP_ROWS = 15
     MAP_COLS = 15
@@ -88,92 +86,92 @@ def create_default_map():
 
     # Créer une petite île avec différents terrains
     for i in range(MAP_ROWS):
-        row = []
+        row = bytearray()
         for j in range(MAP_COLS):
             # Distance du centre
             center_i, center_j = MAP_ROWS // 2, MAP_COLS // 2
             dist = abs(i - center_i) + abs(j - center_j)
 
             if dist > 6:
-                row.append('.')  # Vide autour
+                row.append(EMPTY)  # Vide autour
             elif dist > 5:
-                row.append('W')  # Eau
+                row.append(TILE_BY_CHAR['W'].id)  # Eau
             elif dist > 4:
-                row.append('S')  # Sable
+                row.append(TILE_BY_CHAR['S'].id)  # Sable
             elif random.random() < 0.1:
-                row.append('T')  # Quelques arbres
+                row.append(TILE_BY_CHAR['T'].id)  # Quelques arbres
             else:
-                row.append('G')  # Herbe principalement
+                row.append(TILE_BY_CHAR['G'].id)  # Herbe principalement
         terrain_map.append(row)
+    regions = RegionMap(terrain_map)
+    census.clear(MAP_ROWS, MAP_COLS)
+
+
+def size_for_height(target_height):
+    """Renvoie une fonction de taille qui conserve les proportions pour une hauteur cible"""
+    return lambda width, height: (int(width * target_height / height), round(target_height))
+
+
+def request_sprites(loader):
+    """Lance le chargement et le redimensionnement de toutes les images en arrière-plan"""
+    for tile in TILE_TYPES:
+        if tile.sprite is not None:
+            # Redimensionner l'image pour qu'elle s'adapte aux tuiles isométriques
+            # (sprite_scale agrandit certains terrains, par exemple les arbres x4)
+            loader.request(tile.char, tile.sprite, f"tile{scale}x{tile.sprite_scale}",
+                           size_for_height(scale // 2 * tile.sprite_scale))
+
+    loader.request("villager", "img/villagois.png", f"villager{scale}", size_for_height(int(scale * 0.6)))
+    loader.request("heart", "img/coeur.png", "heart16", lambda width, height: (16, 16))
+    loader.request("carrot", "img/carrot.png", f"carrot{scale}", size_for_height(int(scale * 0.3)))
+
+
+def load_sprites(loader):
+    """Récupère les images chargées en arrière-plan (avec des sprites de remplacement)"""
+    global tile_sprites, villager_sprite, villager_sprite_flipped, heart_sprite, carrot_sprite, baby_sprites
+
+    # Sprites de tuiles pour chaque type de terrain (indexés par identifiant)
+    tile_sprites = []
+    for tile in TILE_TYPES:
+        sprite = None
+        if tile.sprite is not None:
+            sprite = loader.get(tile.char)
+            if sprite is None:
+                print(f"Utilisation d'une tuile de remplacement pour {tile.sprite}")
+                sprite = create_fallback_tile(tile)
+        tile_sprites.append(sprite)
+
+    villager_sprite = loader.get("villager")
+    if villager_sprite is None:
+        print("Image villagois.png non trouvée, utilisation d'un sprite temporaire")
+        villager_sprite = create_dummy_villager()
+    villager_sprite_flipped = pygame.transform.flip(villager_sprite, True, False)
+    baby_sprites = None  # Recalculés à partir du nouveau sprite adulte
 
+    # Sprite coeur pour les particules
+    heart_sprite = loader.get("heart")
+    if heart_sprite is None:
+        print("Image coeur.png non trouvée, utilisation d'un sprite temporaire")
+        # Créer un coeur temporaire
+        heart_sprite = pygame.Surface((16, 16), pygame.SRCALPHA)
+        pygame.draw.polygon(heart_sprite, (255, 20, 147),
+                            [(8, 4), (12, 0), (16, 4), (16, 8), (8, 16), (0, 8), (0, 4), (4, 0)])
 
-def load_tile_sprite(terrain_type):
-    """Charge l'image PNG pour un type de terrain donné"""
-    if terrain_type == '.' or terrain_type not in TERRAIN_TYPES:
-        return None
-
-    filename = TERRAIN_TYPES[terrain_type]
-    if filename is None:
-        return None
-
-    try:
-        # Charger l'image
-        image = pygame.image.load(filename).convert_alpha()
-
-        # Redimensionner l'image pour qu'elle s'adapte aux tuiles isométriques
-        TILE_WIDTH = int(image.get_width())
-        TILE_HEIGHT = int(image.get_height() // 2)
-        target_height = scale // 2
-        scale_ratio = target_height / image.get_height()
-        target_width = int(TILE_WIDTH * scale_ratio)
-
-        # Traitement spécial pour les arbres - 4 fois plus grands
-        if terrain_type == 'T':
-            scale_ratio *= 4  # Multiplier par 4 pour les arbres
-            target_width = int(TILE_WIDTH * scale_ratio)
-            target_height = int(image.get_height() * scale_ratio)
-
-        # Conserver le ratio si l'image est carrée (comme beaucoup de tuiles isométriques)
-        original_width, original_height = image.get_size()
-        if original_width == original_height and terrain_type != 'T':
-            # Image carrée -> redimensionner pour l'isométrie (sauf arbres)
-            scaled_image = pygame.transform.scale(image, (target_width, target_height))
-        else:
-            # Image déjà aux bonnes proportions ou arbre
-            scaled_image = pygame.transform.scale(image, (target_width, target_height))
-
-        return scaled_image
+    carrot_sprite = loader.get("carrot")
+    if carrot_sprite is None:
+        print("Image carrot.png non trouvée, utilisation d'un sprite temporaire")
+        carrot_sprite = create_dummy_carrot()
 
-    except pygame.error as e:
-        print(f"Impossible de charger {filename}: {e}")
-        return create_fallback_tile(terrain_type)
-    except FileNotFoundError:
-        print(f"Fichier {filename} non trouvé, utilisation d'une tuile de remplacement")
-        return create_fallback_tile(terrain_type)
+    loader.shutdown()
 
 
-def create_fallback_tile(terrain_type):
+def create_fallback_tile(tile):
     """Crée une tuile de remplacement si l'image PNG n'est pas trouvée"""
-    tile_width, tile_height = 64, 32
-
-    # Taille spéciale pour les arbres de remplacement
-    if terrain_type == 'T':
-        tile_width *= 4
-        tile_height *= 4
+    # Taille spéciale pour les terrains agrandis (arbres)
+    tile_width, tile_height = 64 * tile.sprite_scale, 32 * tile.sprite_scale
 
     surface = pygame.Surface((tile_width, tile_height), pygame.SRCALPHA)
-
-    # Couleurs de remplacement
-    fallback_colors = {
-        'G': (34, 139, 34),  # Herbe (vert)
-        'S': (194, 178, 128),  # Sable (beige)
-        'W': (65, 105, 225),  # Eau (bleu)
-        'R': (139, 69, 19),  # Roche (marron)
-        'T': (34, 100, 34),  # Arbre (vert foncé)
-        'B': (100, 100, 100),  # Bloc (gris)
-    }
-
-    color = fallback_colors.get(terrain_type, (100, 100, 100))
+    color = tile.fallback_color
 
     # Dessiner un losange comme remplacement
     points = [
@@ -188,9 +186,9 @@ def create_fallback_tile(terrain_type):
     pygame.draw.polygon(surface, border_color, points, 2)
 
     # Ajouter une indication que c'est un remplacement
-    font_size = 16 if terrain_type != 'T' else 32
+    font_size = 16 * min(tile.sprite_scale, 2)
     font = pygame.font.SysFont(None, font_size)
-    text = font.render(terrain_type, True, (255, 255, 255))
+    text = font.render(tile.char, True, (255, 255, 255))
     text_rect = text.get_rect(center=(tile_width // 2, tile_height // 2))
     surface.blit(text, text_rect)
 
@@ -217,58 +215,10 @@ def create_dummy_carrot():
     return surface
 
 
-# Charger la carte depuis un fichier
-load_map_from_file("map/map.txt")
-
-# Créer les sprites de tuiles pour chaque type de terrain
-tile_sprites = {}
-for terrain_type in TERRAIN_TYPES:
-    if terrain_type != '.':
-        sprite = load_tile_sprite(terrain_type)
-        if sprite:
-            tile_sprites[terrain_type] = sprite
-
 # Dimensions des tuiles
 target_width = scale * 0.9
 target_height = scale // 2.2
 
-# Chargement du sprite villageois
-try:
-    villager_img = pygame.image.load("img/villagois.png").convert_alpha()
-    w, h = villager_img.get_size()
-    v_target_height = scale * 0.6
-    v_scale_ratio = v_target_height / h
-    v_target_width = int(w * v_scale_ratio)
-    villager_sprite = pygame.transform.scale(villager_img, (v_target_width, v_target_height))
-    villager_sprite_flipped = pygame.transform.flip(villager_sprite, True, False)
-except:
-    print("Image villagois.png non trouvée, utilisation d'un sprite temporaire")
-    villager_sprite = create_dummy_villager()
-    villager_sprite_flipped = pygame.transform.flip(villager_sprite, True, False)
-
-# Chargement du sprite coeur pour les particules
-try:
-    heart_img = pygame.image.load("img/coeur.png").convert_alpha()
-    heart_sprite = pygame.transform.scale(heart_img, (16, 16))  # Petite taille pour les particules
-except:
-    print("Image coeur.png non trouvée, utilisation d'un sprite temporaire")
-    # Créer un coeur temporaire
-    heart_sprite = pygame.Surface((16, 16), pygame.SRCALPHA)
-    pygame.draw.polygon(heart_sprite, (255, 20, 147),
-                       [(8, 4), (12, 0), (16, 4), (16, 8), (8, 16), (0, 8), (0, 4), (4, 0)])
-
-# Chargement du sprite carotte
-try:
-    carrot_img = pygame.image.load("img/carrot.png").convert_alpha()
-    w, h = carrot_img.get_size()
-    c_target_height = scale * 0.3
-    c_scale_ratio = c_target_height / h
-    c_target_width = int(w * c_scale_ratio)
-    carrot_sprite = pygame.transform.scale(carrot_img, (c_target_width, c_target_height))
-except:
-    print("Image carrot.png non trouvée, utilisation d'un sprite temporaire")
-    carrot_sprite = create_dummy_carrot()
-
 th = target_height // 2
 tw = target_width // 2
 
@@ -301,52 +251,423 @@ def screen_to_iso(screen_x, screen_y):
 def is_valid_tile(i, j):
     """Vérifie si les coordonnées de tuile sont valides et marchables"""
     if 0 <= i < MAP_ROWS and 0 <= j < MAP_COLS:
-        terrain_type = terrain_map[i][j]
-        # Les villageois peuvent marcher sur l'herbe, le sable, les rochers et les blocs
-        # Les arbres ('T') et le vide ('.') ne sont pas traversables
-        return terrain_type in ['G', 'S', 'R', 'B']
+        # La table WALKABLE du registre indique les terrains traversables
+        return bool(WALKABLE[terrain_map[i][j]])
     return False
 
 
-def draw_iso_map():
-    """Dessine la carte isométrique (sans les arbres)"""
+def ground_sprite(i, j):
+    """Sprite du terrain de la tuile (le terrain de base sous une tuile "overlay"), ou None"""
+    tile = TILE_TYPES[terrain_map[i][j]]
+    if tile.layer == "overlay":
+        if tile.base is None:
+            return None
+        tile = TILE_BY_CHAR[tile.base]
+    return tile_sprites[tile.id]
+
+
+def tree_entry(i, j):
+    """Sprite et position d'une tuile "overlay" (arbre), ou None"""
+    tile = TILE_TYPES[terrain_map[i][j]]
+    sprite = tile_sprites[tile.id]
+    if tile.layer != "overlay" or sprite is None:
+        return None
+    screen_x, screen_y = iso_to_screen(i, j)
+    # Centrer l'arbre sur la tuile et le déplacer 2 blocs plus haut
+    adjusted_x = screen_x - (sprite.get_width() - target_width) // 1.5
+    adjusted_y = screen_y - (sprite.get_height() - target_height) + target_height // 2 - (target_height)
+    return sprite, (adjusted_x, adjusted_y)
+
+
+def bake_terrain():
+    """Pré-dessine la carte sur une surface et prépare la liste des arbres à dessiner"""
+    global terrain_surface, tree_entries, tree_order
+
+    terrain_surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    terrain_surface.fill(BACKGROUND_COLOR)
+    tree_entries = {}
     for i in range(MAP_ROWS):
         for j in range(MAP_COLS):
-            terrain_type = terrain_map[i][j]
-            if terrain_type != '.' and terrain_type in tile_sprites:  # and terrain_type != 'T'
-                if terrain_type == 'T':
-                    screen_x, screen_y = iso_to_screen(i, j)
-                    screen.blit(tile_sprites["G"], (screen_x, screen_y))
-                else:
-                    screen_x, screen_y = iso_to_screen(i, j)
-                    screen.blit(tile_sprites[terrain_type], (screen_x, screen_y))
+            sprite = ground_sprite(i, j)
+            if sprite is not None:
+                terrain_surface.blit(sprite, iso_to_screen(i, j))
+            entry = tree_entry(i, j)
+            if entry is not None:
+                tree_entries[(i, j)] = entry
+    tree_order = sorted(tree_entries)  # Même ordre de dessin que le parcours ligne par ligne
+
+
+def ground_sprite_size():
+    """Taille maximale des sprites de terrain (hors tuiles "overlay")"""
+    sprites = [tile_sprites[tile.id] for tile in TILE_TYPES
+               if tile.layer == "ground" and tile_sprites[tile.id] is not None]
+    return max(sprite.get_width() for sprite in sprites), max(sprite.get_height() for sprite in sprites)
+
+
+def redraw_terrain(i, j):
+    """Redessine la zone de la surface pré-dessinée couverte par la tuile (i, j)"""
+    width, height = ground_sprite_size()
+    area = pygame.Rect(iso_to_screen(i, j), (width, height))
+
+    # Tuiles voisines dont le sprite peut chevaucher la zone, redessinées dans l'ordre d'origine
+    reach = int(max(width / max(tw // 2, 1), height / max(th // 2, 1))) + 1
+    terrain_surface.set_clip(area)
+    terrain_surface.fill(BACKGROUND_COLOR)
+    for ni in range(max(i - reach, 0), min(i + reach + 1, MAP_ROWS)):
+        for nj in range(max(j - reach, 0), min(j + reach + 1, MAP_COLS)):
+            sprite = ground_sprite(ni, nj)
+            if sprite is not None and area.colliderect(sprite.get_rect(topleft=iso_to_screen(ni, nj))):
+                terrain_surface.blit(sprite, iso_to_screen(ni, nj))
+    terrain_surface.set_clip(None)
+
+
+def draw_iso_map():
+    """Dessine la carte isométrique pré-dessinée (sans les tuiles "overlay" comme les arbres)"""
+    if terrain_surface is None:
+        bake_terrain()
+    screen.blit(terrain_surface, (0, 0))
 
 
 def draw_trees():
     """Dessine les arbres en dernier pour qu'ils apparaissent au-dessus de tout"""
+    for key in tree_order:
+        sprite, position = tree_entries[key]
+        screen.blit(sprite, position)
+
+
+def set_tile(i, j, tile_id):
+    """Change le terrain d'une tuile en cours de partie
+
+    Seul ce qui dépend de la tuile est mis à jour : sa région (et les chemins
+    en cache qui la traversent), la couche de nourriture, la zone de la carte
+    pré-dessinée et l'entrée de l'arbre. is_valid_tile lit directement la carte.
+    """
+    global density_diamond
+    if not (0 <= i < MAP_ROWS and 0 <= j < MAP_COLS) or terrain_map[i][j] == tile_id:
+        return False
+    terrain_map[i][j] = tile_id
+    if painted_tiles is not None:
+        painted_tiles.append((i, j, tile_id))
+    regions.update_tile(i, j)
+    if food_grid is not None:
+        food_grid.update_tile(i, j, tile_id)
+
+    if density_base is not None:
+        density_base[(i * MAP_COLS + j) * 4:(i * MAP_COLS + j + 1) * 4] = bytes(density_color(tile_id))
+        density_diamond = None
+    if terrain_surface is not None:
+        redraw_terrain(i, j)
+        # Zone à redessiner aux zooms réduits : la tuile et l'arbre d'avant comme d'après
+        changed = [pygame.Rect(iso_to_screen(i, j), ground_sprite_size())]
+        entry = tree_entry(i, j)
+        if (i, j) in tree_entries:
+            sprite, position = tree_entries.pop((i, j))
+            changed.append(sprite.get_rect(topleft=position))
+            del tree_order[bisect.bisect_left(tree_order, (i, j))]
+        if entry is not None:
+            tree_entries[(i, j)] = entry
+            bisect.insort(tree_order, (i, j))
+            changed.append(entry[0].get_rect(topleft=entry[1]))
+        redraw_zoomed_terrain(changed)
+
+    # Les carottes d'une tuile devenue infranchissable disparaissent
+    if not WALKABLE[tile_id]:
+        carrots.take_at(i, j)
+    return True
+
+
+def tile_at_screen(screen_x, screen_y):
+    """Tuile dont le dessus est sous le point (screen_x, screen_y) de l'écran"""
+    width, height = tile_sprites[TILE_BY_CHAR['G'].id].get_size()
+    screen_x, screen_y = from_view(screen_x, screen_y)
+    # iso_to_screen donne le coin haut-gauche du sprite : viser le centre de sa face supérieure
+    return screen_to_iso(screen_x - width // 2, screen_y - height // 4)
+
+
+FOOD_MARKER_SCALE = 0.5  # Taille des carottes de la couche de nourriture, par rapport au sprite
+
+food_overlay = None  # (couche, version, zoom, calque pré-dessiné, coin haut-gauche sur la carte)
+
+
+def bake_food_overlay():
+    """Pré-dessine une petite carotte sur chaque tuile pourvue de la couche de nourriture
+
+    Au zoom 1 le calque couvre la fenêtre, aux zooms réduits toute la carte.
+    Il n'est refait que lorsque le champ de distances a été recalculé.
+    """
+    global food_overlay
+    rect = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT) if view_zoom == 1 else map_rect()
+    surface = pygame.Surface((max(1, round(rect.width * view_zoom)), max(1, round(rect.height * view_zoom))),
+                             pygame.SRCALPHA)
+    scale = FOOD_MARKER_SCALE * view_zoom
+    marker = pygame.transform.smoothscale(carrot_sprite, (max(1, round(carrot_sprite.get_width() * scale)),
+                                                          max(1, round(carrot_sprite.get_height() * scale))))
+    width, height = marker.get_size()
+
+    # Positions calculées pour toutes les tuiles d'un coup (tableaux NumPy de la couche)
+    screen_x, screen_y = iso_to_screen_walkable(*(food_grid.amount >= 1).nonzero())
+    x = (screen_x + target_width / 2 - rect.x) * view_zoom - width / 2
+    y = (screen_y + target_height - rect.y) * view_zoom - height
+    inside = (x > -width) & (x < surface.get_width()) & (y > -height) & (y < surface.get_height())
+    surface.blits([(marker, position) for position in zip(x[inside].tolist(), y[inside].tolist())],
+                  doreturn=False)
+    food_overlay = (food_grid, food_grid.version, view_zoom, surface, rect.topleft)
+
+
+def draw_food():
+    """Dessine le calque des tuiles de la couche de nourriture qui en contiennent"""
+    if (food_overlay is None or food_overlay[0] is not food_grid or food_overlay[1] != food_grid.version or
+            food_overlay[2] != view_zoom):
+        bake_food_overlay()
+    _, _, _, surface, (x, y) = food_overlay
+    screen.blit(surface, to_view(x, y))
+
+
+# Niveaux de détail du dessin, choisis à chaque image selon le zoom et le nombre de villageois visibles :
+# sprites complets (balancement), sprites réduits sans rotation, ou carte de densité par tuile
+ZOOM_LEVELS = [1.0, 0.5, 0.25, 0.125, 0.0625]
+DENSITY_ZOOM = 0.25  # En dessous de ce zoom, seule la carte de densité est dessinée
+FULL_DETAIL_LIMIT = 300  # Au-delà de ce nombre de villageois visibles, plus de rotation ni de particules
+REDUCED_DETAIL_LIMIT = 3000  # Au-delà, la carte de densité remplace les sprites
+
+# Couleurs de la carte de densité (RGBA)
+DENSITY_GROUND = (70, 110, 60, 255)
+DENSITY_OBSTACLE = (45, 60, 75, 255)
+DENSITY_FOOD = (150, 210, 70, 255)
+
+view_zoom = 1.0
+view_center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2)  # Point de la carte au centre de l'écran
+zoomed_terrain = {}  # Zoom -> (carte entière pré-dessinée à ce zoom, coin haut-gauche sur la carte)
+scaled_sprites = {}  # (sprite, zoom) -> sprite réduit
+density_base = None  # Pixels RGBA du terrain pour la carte de densité (un pixel par tuile)
+density_diamond = None  # density_base projetée en losange (refaite seulement si le terrain change)
+
+
+def map_rect():
+    """Rectangle (coordonnées d'écran au zoom 1) couvrant toute la carte, arbres compris"""
+    width = max(sprite.get_width() for sprite in tile_sprites if sprite is not None)
+    height = max(sprite.get_height() for sprite in tile_sprites if sprite is not None)
+    left = iso_to_screen(0, MAP_COLS - 1)[0] - width
+    right = iso_to_screen(MAP_ROWS - 1, 0)[0] + width
+    top = iso_to_screen(0, 0)[1] - height
+    bottom = iso_to_screen(MAP_ROWS - 1, MAP_COLS - 1)[1] + height
+    return pygame.Rect(left, top, right - left, bottom - top)
+
+
+def set_zoom(zoom):
+    """Change le zoom de la vue (le zoom 1 est la vue d'origine, centrée sur la fenêtre)"""
+    global view_zoom, view_center
+    view_zoom = zoom
+    view_center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2) if zoom == 1 else map_rect().center
+
+
+def to_view(x, y):
+    """Coordonnées d'écran au zoom 1 -> coordonnées dans la vue"""
+    return ((x - view_center[0]) * view_zoom + WINDOW_WIDTH / 2,
+            (y - view_center[1]) * view_zoom + WINDOW_HEIGHT / 2)
+
+
+def from_view(x, y):
+    return ((x - WINDOW_WIDTH / 2) / view_zoom + view_center[0],
+            (y - WINDOW_HEIGHT / 2) / view_zoom + view_center[1])
+
+
+def scaled_sprite(sprite, zoom=None):
+    """Sprite réduit au zoom courant, ou à `zoom` (calculé une seule fois par zoom)"""
+    zoom = view_zoom if zoom is None else zoom
+    key = (sprite, zoom)
+    scaled = scaled_sprites.get(key)
+    if scaled is None:
+        size = (max(1, round(sprite.get_width() * zoom)), max(1, round(sprite.get_height() * zoom)))
+        scaled = scaled_sprites[key] = pygame.transform.smoothscale(sprite, size)
+    return scaled
+
+
+def blit_view(sprite, x, y):
+    """Dessine un sprite placé en (x, y) au zoom 1 dans la vue courante"""
+    if view_zoom == 1:
+        screen.blit(sprite, (x, y))
+    else:
+        screen.blit(scaled_sprite(sprite), to_view(x, y))
+
+
+def bake_zoomed_terrain():
+    """Pré-dessine toute la carte, arbres compris, au zoom courant"""
+    if terrain_surface is None:
+        bake_terrain()  # Prépare aussi la liste des arbres
+    rect = map_rect()
+    surface = pygame.Surface((max(1, round(rect.width * view_zoom)), max(1, round(rect.height * view_zoom))))
+    surface.fill(BACKGROUND_COLOR)
     for i in range(MAP_ROWS):
         for j in range(MAP_COLS):
-            terrain_type = terrain_map[i][j]
-            if terrain_type == 'T' and terrain_type in tile_sprites:
-                screen_x, screen_y = iso_to_screen(i, j)
-                sprite = tile_sprites[terrain_type]
-                # Centrer l'arbre sur la tuile et le déplacer 2 blocs plus haut
-                adjusted_x = screen_x - (sprite.get_width() - target_width) // 1.5
-                adjusted_y = screen_y - (sprite.get_height() - target_height) + target_height // 2 - (target_height)
-                screen.blit(sprite, (adjusted_x, adjusted_y))
+            sprite = ground_sprite(i, j)
+            if sprite is not None:
+                x, y = iso_to_screen(i, j)
+                surface.blit(scaled_sprite(sprite), ((x - rect.x) * view_zoom, (y - rect.y) * view_zoom))
+    # Aux zooms réduits, les arbres sont dessinés sous les villageois
+    for key in tree_order:
+        sprite, (x, y) = tree_entries[key]
+        surface.blit(scaled_sprite(sprite), ((x - rect.x) * view_zoom, (y - rect.y) * view_zoom))
+    zoomed_terrain[view_zoom] = (surface, rect.topleft)
+
+
+def redraw_zoomed_terrain(changed):
+    """Redessine, dans chaque carte pré-dessinée à un zoom réduit, la zone des sprites de `changed`
+
+    `changed` : rectangles (coordonnées d'écran au zoom 1) des sprites
+    modifiés, avant comme après. Comme bake_zoomed_terrain : les terrains qui
+    chevauchent la zone dans l'ordre des lignes, puis les arbres.
+    """
+    if not zoomed_terrain:
+        return
+    # Seules les tuiles ancrées à moins d'un sprite de la zone peuvent la chevaucher
+    width = max(sprite.get_width() for sprite in tile_sprites if sprite is not None)
+    height = max(sprite.get_height() for sprite in tile_sprites if sprite is not None)
+    reach = changed[0].unionall(changed[1:]).inflate(2 * width, 2 * height)
+    corners = [screen_to_iso(x, y) for x in (reach.left, reach.right) for y in (reach.top, reach.bottom)]
+    ground, trees = [], []
+    for i in range(max(min(c[0] for c in corners) - 1, 0), min(max(c[0] for c in corners) + 2, MAP_ROWS)):
+        for j in range(max(min(c[1] for c in corners) - 1, 0), min(max(c[1] for c in corners) + 2, MAP_COLS)):
+            sprite = ground_sprite(i, j)
+            if sprite is not None:
+                ground.append((sprite, iso_to_screen(i, j)))
+            if (i, j) in tree_entries:
+                trees.append(tree_entries[(i, j)])
+
+    for zoom, (surface, (left, top)) in zoomed_terrain.items():
+        def scaled_rect(position, size):
+            # Rectangle couvert par un sprite réduit, placé comme dans bake_zoomed_terrain
+            return pygame.Rect(int((position[0] - left) * zoom), int((position[1] - top) * zoom),
+                               max(1, round(size[0] * zoom)), max(1, round(size[1] * zoom)))
+
+        clip = scaled_rect(changed[0].topleft, changed[0].size).unionall(
+            [scaled_rect(rect.topleft, rect.size) for rect in changed[1:]])
+        surface.set_clip(clip)
+        surface.fill(BACKGROUND_COLOR)
+        for sprite, position in ground + trees:
+            if clip.colliderect(scaled_rect(position, sprite.get_size())):
+                surface.blit(scaled_sprite(sprite, zoom), ((position[0] - left) * zoom, (position[1] - top) * zoom))
+        surface.set_clip(None)
+
+
+def draw_zoomed_terrain():
+    if view_zoom not in zoomed_terrain:
+        bake_zoomed_terrain()
+    surface, (x, y) = zoomed_terrain[view_zoom]
+    screen.fill(BACKGROUND_COLOR)
+    screen.blit(surface, to_view(x, y))
+
+
+def visible_villagers():
+    """Villageois dont la position tombe dans la vue"""
+    left, top = from_view(0, 0)
+    right, bottom = from_view(WINDOW_WIDTH, WINDOW_HEIGHT)
+    return [v for v in villagers if left <= v.x + v.width and v.x <= right and top <= v.y + v.height and v.y <= bottom]
+
+
+def detail_level():
+    """Niveau de détail de l'image et villageois à dessiner
+
+    Renvoie "full" (sprites complets), "reduced" (sprites réduits en cache) ou
+    "density" (carte de densité). Les villageois visibles ne sont filtrés (en
+    O(N)) que si la population entière dépasse la limite du niveau choisi.
+    """
+    if view_zoom < DENSITY_ZOOM:
+        return "density", []
+    detail, limit = ("full", FULL_DETAIL_LIMIT) if view_zoom == 1 else ("reduced", REDUCED_DETAIL_LIMIT)
+    if len(villagers) <= limit:
+        return detail, villagers.items
+    visible = visible_villagers()
+    if len(visible) > REDUCED_DETAIL_LIMIT:
+        return "density", visible
+    if len(visible) > FULL_DETAIL_LIMIT:
+        return "reduced", visible
+    return detail, visible
+
+
+def density_color(tile_id):
+    if tile_id == EMPTY:
+        return (0, 0, 0, 0)
+    return DENSITY_GROUND if WALKABLE[tile_id] else DENSITY_OBSTACLE
+
+
+def density_diamond_of(pixels):
+    """Projette une image d'un pixel par tuile (RGBA) en losange isométrique"""
+    # Lignes = i, colonnes = j ; retourner puis tourner de 45° donne la projection isométrique
+    image = pygame.image.frombuffer(pixels, (MAP_COLS, MAP_ROWS), 'RGBA')
+    return pygame.transform.rotate(pygame.transform.flip(image, True, False), 45)
+
+
+def draw_density():
+    """Carte de densité : un pixel par tuile (population et nourriture), projeté en losange
+
+    Le terrain projeté est gardé en cache ; seul le calque des villageois
+    (tenu à jour par census) et de la nourriture est projeté à chaque image.
+    """
+    global density_base, density_diamond
+    if density_base is None:
+        density_base = bytearray(b"".join(bytes(density_color(tile_id)) for row in terrain_map for tile_id in row))
+    if density_diamond is None:
+        density_diamond = density_diamond_of(density_base)
+
+    # Nourriture sur les tuiles sans villageois, puis villageois du jaune (un seul) au rouge (foule)
+    if food_grid is not None:
+        import numpy as np  # Présent avec la couche de nourriture
+        overlay = np.frombuffer(census.crowd_pixels, dtype=np.uint8).reshape(-1, 4).copy()
+        empty = np.frombuffer(census.occupancy, dtype=np.int32) <= 0
+        overlay[(food_grid.amount >= 1).ravel() & empty] = DENSITY_FOOD
+        pixels = overlay.tobytes()
+    else:
+        pixels = bytearray(census.crowd_pixels)
+        for i, j in carrots.by_tile:
+            tile = i * MAP_COLS + j
+            if census.occupancy[tile] <= 0:
+                pixels[tile * 4:tile * 4 + 4] = bytes(DENSITY_FOOD)
+    diamond = density_diamond.copy()
+    diamond.blit(density_diamond_of(pixels), (0, 0))
+
+    # Losange de la carte : du coin haut de la tuile (0, 0) au coin bas de la tuile opposée
+    width, height = tile_sprites[TILE_BY_CHAR['G'].id].get_size()
+    x0, y0 = iso_to_screen(0, 0)
+    step_x, step_y = tw // 2, th // 2
+    left = x0 + width // 2 - MAP_COLS * step_x
+    top = y0 + height // 4 - step_y
+    view_left, view_top = to_view(left, top)
+    target = pygame.Rect(round(view_left), round(view_top), round((MAP_ROWS + MAP_COLS) * step_x * view_zoom),
+                         round((MAP_ROWS + MAP_COLS) * step_y * view_zoom))
+
+    # Seule la partie visible est agrandie, quelle que soit la taille de la carte
+    visible = target.clip(screen.get_rect())
+    screen.fill(BACKGROUND_COLOR)
+    if visible.width <= 0 or visible.height <= 0:
+        return
+    scale_x = diamond.get_width() / target.width
+    scale_y = diamond.get_height() / target.height
+    source = pygame.Rect(int((visible.x - target.x) * scale_x), int((visible.y - target.y) * scale_y),
+                         max(1, math.ceil(visible.width * scale_x)), max(1, math.ceil(visible.height * scale_y)))
+    source = source.clip(diamond.get_rect())
+    if source.width > 0 and source.height > 0:
+        screen.blit(pygame.transform.scale(diamond.subsurface(source), visible.size), visible)
 
 
 class Carrot:
-    def __init__(self):
+    def __init__(self, tile=None):
+        self.reset(tile)
+
+    def reset(self, tile=None):
+        """Place la carotte (appelé aussi quand le pool réutilise une carotte mangée)"""
         self.sprite = carrot_sprite
         self.width = self.sprite.get_width()
         self.height = self.sprite.get_height()
 
-        # Trouver une position valide pour la carotte
+        # Trouver une position valide pour la carotte (ou utiliser la tuile imposée)
         attempts = 0
         while attempts < 100:
-            self.tile_i = random.randint(0, MAP_ROWS - 1)
-            self.tile_j = random.randint(0, MAP_COLS - 1)
+            if tile is not None:
+                self.tile_i, self.tile_j = tile
+            else:
+                self.tile_i = random.randint(0, MAP_ROWS - 1)
+                self.tile_j = random.randint(0, MAP_COLS - 1)
 
             if is_valid_tile(self.tile_i, self.tile_j):
                 screen_x, screen_y = iso_to_screen_walkable(self.tile_i, self.tile_j)
@@ -370,8 +691,315 @@ class Carrot:
         bob_y = self.y + math.sin(self.bob_offset) * self.bob_amplitude
         surface.blit(self.sprite, (self.x, bob_y))
 
+
+class SpatialGrid:
+    """Index spatial par cellules carrées de tuiles (recherche des plus proches voisins)"""
+
+    def __init__(self, cell_size=8):
+        self.cell_size = cell_size
+        self.cells = {}  # (ci, cj) -> {id(objet): objet}
+        self.where = {}  # id(objet) -> cellule de l'objet
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, obj):
+        return id(obj) in self.where
+
+    def _cell(self, i, j):
+        return i // self.cell_size, j // self.cell_size
+
+    def add(self, obj):
+        cell = self._cell(obj.tile_i, obj.tile_j)
+        self.cells.setdefault(cell, {})[id(obj)] = obj
+        self.where[id(obj)] = cell
+
+    def remove(self, obj):
+        cell = self.where.pop(id(obj), None)
+        if cell is None:
+            return
+        in_cell = self.cells[cell]
+        del in_cell[id(obj)]
+        if not in_cell:
+            del self.cells[cell]
+
+    def update(self, obj):
+        """Change l'objet de cellule s'il a changé de tuile"""
+        if self.where.get(id(obj)) != self._cell(obj.tile_i, obj.tile_j):
+            self.remove(obj)
+            self.add(obj)
+
+    def clear(self):
+        self.cells = {}
+        self.where = {}
+
+    def __getstate__(self):
+        # Les clés id() n'ont pas de sens après désérialisation : garder les objets dans leur ordre
+        return self.cell_size, [obj for cell in self.cells.values() for obj in cell.values()]
+
+    def __setstate__(self, state):
+        self.cell_size, objects = state
+        self.clear()
+        for obj in objects:
+            self.add(obj)
+
+    def nearby(self, i, j, count, accept=None):
+        """Renvoie jusqu'à `count` objets les plus proches (distance de Manhattan), triés"""
+        ci, cj = self._cell(i, j)
+        found = []
+        visited = 0
+        radius = 0
+        # Parcours des cellules en anneaux concentriques autour de la cellule de départ
+        while visited < len(self.where):
+            for di in range(-radius, radius + 1):
+                for dj in range(-radius, radius + 1):
+                    if max(abs(di), abs(dj)) != radius:
+                        continue
+                    for obj in self.cells.get((ci + di, cj + dj), {}).values():
+                        visited += 1
+                        if accept is None or accept(obj):
+                            distance = abs(i - obj.tile_i) + abs(j - obj.tile_j)
+                            found.append((distance, obj))
+
+            # Tout objet d'un anneau plus éloigné est au moins à cette distance
+            if len(found) >= count:
+                found.sort(key=lambda entry: entry[0])
+                if found[count - 1][0] <= radius * self.cell_size:
+                    break
+            radius += 1
+
+        found.sort(key=lambda entry: entry[0])
+        return found[:count]
+
+
+class CarrotStore:
+    """Stocke les carottes avec un index spatial par cellules et un index par tuile
+
+    Les carottes mangées retournent dans un pool (voir pool.py) et sont
+    réutilisées par spawn() ; une carotte visée est suivie avec sa génération.
+    """
+
+    def __init__(self, cell_size=8, factory=None):
+        self.pool = Pool(factory or Carrot)
+        self.by_tile = {}  # (i, j) -> liste des carottes sur cette tuile
+        self.grid = SpatialGrid(cell_size)
+
+    def __len__(self):
+        return len(self.pool)
+
+    def __iter__(self):
+        return iter(self.pool)
+
+    def spawn(self, tile=None):
+        """Fait apparaître une carotte (sur une tuile au hasard si `tile` n'est pas donnée)"""
+        carrot = self.pool.acquire(tile)
+        carrot.seekers = 0
+        self.by_tile.setdefault((carrot.tile_i, carrot.tile_j), []).append(carrot)
+        self.grid.add(carrot)
+        return carrot
+
+    def remove(self, carrot):
+        """Retire une carotte en O(1) et la rend au pool"""
+        tile = (carrot.tile_i, carrot.tile_j)
+        on_tile = self.by_tile[tile]
+        on_tile.remove(carrot)  # Quasiment toujours une seule carotte par tuile
+        if not on_tile:
+            del self.by_tile[tile]
+        self.grid.remove(carrot)
+        self.pool.release(carrot)
+
+    def take_at(self, i, j):
+        """Retire et renvoie les carottes posées sur la tuile (i, j)"""
+        on_tile = self.by_tile.get((i, j))
+        if not on_tile:
+            return []
+        taken = list(on_tile)
+        for carrot in taken:
+            self.remove(carrot)
+        return taken
+
+    def clear(self):
+        self.pool.clear()
+        self.by_tile = {}
+        self.grid.clear()
+
+    def nearby(self, i, j, count, accept=None):
+        """Renvoie jusqu'à `count` carottes les plus proches, triées par distance"""
+        return self.grid.nearby(i, j, count, accept)
+
+
+class Matchmaker:
+    """Regroupe les adultes prêts à se reproduire par cellules et forme les couples
+
+    Le bassin contient exactement les villageois pour lesquels can_reproduce()
+    est vrai. Il est mis à jour quand un villageois franchit le seuil de
+    carottes, termine son délai de reproduction, grandit ou change de tuile.
+    """
+
+    def __init__(self, cell_size=8):
+        self.pool = SpatialGrid(cell_size)
+
+    def refresh(self, villager):
+        """Met à jour la présence du villageois dans le bassin des partenaires"""
+        # Un villageois rendu au pool (mort ou parti vers une autre région) n'y revient jamais
+        if villager.index != -1 and villager.can_reproduce():
+            if villager in self.pool:
+                self.pool.update(villager)
+            else:
+                self.pool.add(villager)
+        else:
+            self.pool.remove(villager)
+
+    def pair(self, villager):
+        """Associe le villageois au partenaire disponible le plus proche (les deux ou aucun)"""
+        if villager not in self.pool:
+            return None
+        # Les villageois d'une autre île sont ignorés (même composante connexe exigée)
+        region = regions.region(villager.tile_i, villager.tile_j)
+        candidates = self.pool.nearby(
+            villager.tile_i, villager.tile_j, 1,
+            accept=lambda other: other is not villager and regions.region(other.tile_i, other.tile_j) == region)
+        if not candidates:
+            return None
+
+        partner = candidates[0][1]
+        self.pool.remove(villager)
+        self.pool.remove(partner)
+        for v, other in ((villager, partner), (partner, villager)):
+            v.target_partner = other
+            v.seeking_partner = True
+            v.reproduction_state = "seeking"
+            v.reproduction_stuck_counter = 0
+        return partner
+
+    def is_paired(self, villager, partner, others):
+        """Vérifie que le couple est toujours cohérent des deux côtés"""
+        return (partner in others and
+                villager.reproduction_state == "seeking" and
+                partner.reproduction_state == "seeking" and
+                villager.target_partner is partner and
+                partner.target_partner is villager)
+
+    def release(self, villager):
+        """Annule le couple du villageois et libère les deux partenaires"""
+        partner = villager.target_partner
+        for v in (villager, partner):
+            if v is None or (v is partner and v.target_partner is not villager):
+                continue
+            v.reproduction_state = "none"
+            v.seeking_partner = False
+            v.target_partner = None
+            v.reproduction_stuck_counter = 0
+            self.refresh(v)
+
+    def clear(self):
+        self.pool.clear()
+
+
+class Census:
+    """Compteurs de la population tenus à jour à chaque changement
+
+    L'affichage (HUD, carte de densité) les lit directement au lieu de
+    parcourir tous les villageois à chaque image. La carte d'occupation garde
+    le nombre de villageois de chaque tuile et le pixel RGBA correspondant de
+    la carte de densité (transparent si la tuile est vide).
+    """
+
+    def __init__(self):
+        self.clear(0, 0)
+
+    def clear(self, rows, cols):
+        self.cols = cols
+        self.babies = 0
+        self.carrots_held = 0
+        self.occupancy = array('i', bytes(4 * rows * cols))
+        self.crowd_pixels = bytearray(4 * rows * cols)
+
+    def add(self, villager, sign=1):
+        self.babies += sign * villager.is_baby
+        self.carrots_held += sign * villager.carrots_collected
+        self.occupy(villager.tile_i, villager.tile_j, sign)
+
+    def remove(self, villager):
+        self.add(villager, -1)
+
+    def occupy(self, i, j, delta):
+        """Ajoute `delta` villageois sur la tuile (i, j)"""
+        tile = i * self.cols + j
+        count = self.occupancy[tile] + delta
+        self.occupancy[tile] = count
+        # Du jaune (un seul villageois) au rouge (foule)
+        self.crowd_pixels[tile * 4:tile * 4 + 4] = bytes((255, max(0, 230 - 45 * count), 40, 255) if count > 0
+                                                          else (0, 0, 0, 0))
+
+
+def allocate_carrots(villagers, carrots, ghost_carrots=None):
+    """Répartit les carottes entre les villageois affamés (attribution gloutonne globale)
+
+    Chaque villageois propose ses carottes les plus proches, puis les paires
+    (villageois, carotte) sont attribuées par distance croissante. Une carotte
+    ne peut être visée que par MAX_SEEKERS_PER_CARROT villageois à la fois.
+    `ghost_carrots` contient les carottes des régions voisines en mode réparti.
+    """
+    stores = [carrots] if ghost_carrots is None else [carrots, ghost_carrots]
+    for store in stores:
+        for carrot in store:
+            carrot.seekers = 0
+
+    hungry = []
+    for v in villagers:
+        if v.reproduction_state == "none":
+            hungry.append(v)
+        elif v.target_carrot is not None:
+            # Le villageois est occupé à se reproduire, il libère sa carotte
+            v.target_carrot = None
+            v.seeking_carrot = False
+
+    candidates = []
+    for order, v in enumerate(hungry):
+        # Seules les carottes accessibles (même composante connexe) sont proposées
+        region = regions.region(v.tile_i, v.tile_j)
+        if region is None:
+            continue
+
+        def reachable(carrot):
+            return regions.region(carrot.tile_i, carrot.tile_j) == region
+
+        # Le rayon de recherche est un gène : les carottes plus lointaines sont ignorées
+        radius = v.trait(SEARCH_RADIUS)
+        for store in stores:
+            for distance, carrot in store.nearby(v.tile_i, v.tile_j, FOOD_CANDIDATES, reachable):
+                if distance > radius:
+                    break
+                candidates.append((distance, order, carrot.index, v, carrot))
+    candidates.sort(key=lambda entry: entry[:3])
+
+    assigned = set()
+    for distance, order, _, v, carrot in candidates:
+        if order in assigned or carrot.seekers >= MAX_SEEKERS_PER_CARROT:
+            continue
+        assigned.add(order)
+        carrot.seekers += 1
+        metrics.search_distance_total += distance
+        metrics.search_count += 1
+        if v.target_carrot is not carrot:
+            v.carrot_stuck_counter = 0
+        v.target_carrot = carrot
+        v.target_carrot_generation = carrot.generation
+        v.seeking_carrot = True
+
+    # Les villageois sans carotte attribuée abandonnent leur ancienne cible
+    for order, v in enumerate(hungry):
+        if order not in assigned:
+            v.target_carrot = None
+            v.seeking_carrot = False
+
+
 class Particle:
     def __init__(self, x, y):
+        self.reset(x, y)
+
+    def reset(self, x, y):
         self.x = x
         self.y = y
         self.vel_x = random.uniform(-0.2, 0.2)
@@ -387,19 +1015,42 @@ class Particle:
         self.life -= 1
 
     def draw(self, surface):
-        alpha = int(255 * (self.life / self.max_life))
-        temp_surface = self.sprite.copy()
-        temp_surface.set_alpha(alpha)
-        surface.blit(temp_surface, (self.x, self.y))
+        # Transparence appliquée au sprite partagé juste avant le dessin (pas de copie)
+        self.sprite.set_alpha(int(255 * (self.life / self.max_life)))
+        surface.blit(self.sprite, (self.x, self.y))
 
     def is_alive(self):
         return self.life > 0
 
 
+baby_sprites = None  # Sprites réduits des bébés (calculés à la demande)
+
+
+def villager_images(is_baby):
+    """Renvoie les sprites (normal, retourné) d'un adulte ou d'un bébé (réduits une seule fois)"""
+    global baby_sprites
+    if not is_baby:
+        return villager_sprite, villager_sprite_flipped
+    if baby_sprites is None:
+        # Réduire la taille pour les bébés
+        baby_scale = 0.6
+        baby_width = int(villager_sprite.get_width() * baby_scale)
+        baby_height = int(villager_sprite.get_height() * baby_scale)
+        baby_sprites = (pygame.transform.scale(villager_sprite, (baby_width, baby_height)),
+                        pygame.transform.scale(villager_sprite_flipped, (baby_width, baby_height)))
+    return baby_sprites
+
+
 class Villageois:
-    def __init__(self, all_villagers, is_baby=False, spawn_pos=None):
-        self.image_original = villager_sprite
-        self.image_flipped = villager_sprite_flipped
+    def __init__(self, all_villagers, is_baby=False, spawn_pos=None, parents=None):
+        self.reset(all_villagers, is_baby, spawn_pos, parents)
+
+    def reset(self, all_villagers, is_baby=False, spawn_pos=None, parents=None):
+        """Initialise le villageois (appelé aussi quand le pool réutilise un villageois libéré)
+
+        `parents` : identifiants des deux parents dans la généalogie (None pour un fondateur).
+        """
+        self.image_original, self.image_flipped = villager_images(is_baby)
         self.current_image = self.image_original
         self.facing_right = False
 
@@ -413,16 +1064,7 @@ class Villageois:
         self.seeking_partner = False
         self.target_partner = None
         self.reproduction_state = "none"  # "none", "seeking", "reproducing"
-
-        # Ajuster la taille selon l'âge
-        if self.is_baby:
-            # Réduire la taille pour les bébés
-            baby_scale = 0.6
-            baby_width = int(self.image_original.get_width() * baby_scale)
-            baby_height = int(self.image_original.get_height() * baby_scale)
-            self.image_original = pygame.transform.scale(self.image_original, (baby_width, baby_height))
-            self.image_flipped = pygame.transform.scale(self.image_flipped, (baby_width, baby_height))
-            self.current_image = self.image_original
+        self.reproduction_stuck_counter = 0
 
         self.width = self.current_image.get_width()
         self.height = self.current_image.get_height()
@@ -468,7 +1110,6 @@ class Villageois:
         # Propriétés de mouvement et comportement (initialisées pour tous les villageois)
         self.angle = 0
         self.angle_dir = 1
-        self.speed = 1
 
         self.target_tile_i = self.tile_i
         self.target_tile_j = self.tile_j
@@ -479,15 +1120,57 @@ class Villageois:
 
         # Inventaire du villageois
         self.carrots_collected = 0
-        self.target_carrot = None  # Carotte ciblée
+        self.target_carrot = None  # Carotte ciblée (attribuée par allocate_carrots)
+        self.target_carrot_generation = 0  # Génération de la carotte au moment de l'attribution
         self.seeking_carrot = False
+        self.carrot_stuck_counter = 0
+
+        # Identifiant stable dans la généalogie (le mode réparti n'en tient pas)
+        self.uid = NO_PARENT
+        if genealogy is not None:
+            self.uid = genealogy.record_birth(tick, self.tile_i, self.tile_j, parents)
+        census.add(self)
+
+    def __getstate__(self):
+        """État transmis à un autre processus (mode réparti, voir shard.py)
+
+        Les sprites sont retirés, ainsi que les références vers le partenaire et
+        la carotte visée : elles n'ont pas de sens dans le processus qui reçoit
+        le villageois. Le partenaire resté sur place annule alors le couple.
+        """
+        state = self.__dict__.copy()
+        del state["image_original"], state["image_flipped"], state["current_image"]
+        state["genome"] = villagers.row(self, "genome")  # Repris par Pool.adopt à l'arrivée
+        state["target_partner"] = None
+        state["seeking_partner"] = False
+        state["reproduction_state"] = "none"
+        state["target_carrot"] = None
+        state["seeking_carrot"] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.image_original, self.image_flipped = villager_images(self.is_baby)
+        self.current_image = self.image_original if self.facing_right else self.image_flipped
+
+    def retire(self):
+        """Appelé par le pool avant la libération : défait le couple et abandonne la carotte visée"""
+        matchmaker.release(self)
+        matchmaker.pool.remove(self)
+        self.target_carrot = None
+        self.seeking_carrot = False
+        census.remove(self)
+
+    def trait(self, gene):
+        """Valeur d'un trait héréditaire, lue dans la colonne des génomes du pool"""
+        assert self.index >= 0, "trait d'un villageois libéré"
+        return VALUES[gene][villagers.columns["genome"][self.index * GENES + gene]]
 
     def get_adjacent_tiles(self):
         """Retourne les tuiles adjacentes valides"""
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
         valid_tiles = []
 
-        for di, dj in directions:
+        for di, dj in DIRECTIONS:
             new_i = self.tile_i + di
             new_j = self.tile_j + dj
             if is_valid_tile(new_i, new_j):
@@ -495,27 +1178,15 @@ class Villageois:
 
         return valid_tiles
 
-    def find_nearest_carrot(self, carrots):
-        """Trouve la carotte la plus proche"""
-        if not carrots:
-            return None
-
-        min_distance = float('inf')
-        nearest_carrot = None
-
-        for carrot in carrots:
-            distance = abs(self.tile_i - carrot.tile_i) + abs(self.tile_j - carrot.tile_j)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_carrot = carrot
-
-        return nearest_carrot
-
     def path_to_carrot(self, target_carrot):
         """Trouve le prochain mouvement vers la carotte ciblée"""
         if not target_carrot:
             return None
 
+        # Cible dans un autre bloc de la carte : suivre le graphe de régions
+        if not regions.same_node(self.tile_i, self.tile_j, target_carrot.tile_i, target_carrot.tile_j):
+            return regions.next_step(self.tile_i, self.tile_j, target_carrot.tile_i, target_carrot.tile_j)
+
         # Calculer la direction générale vers la carotte
         di = target_carrot.tile_i - self.tile_i
         dj = target_carrot.tile_j - self.tile_j
@@ -549,13 +1220,18 @@ class Villageois:
             if is_valid_tile(alt_i, alt_j):
                 return (alt_i, alt_j)
 
-        return None
+        # Obstacle : contourner par un plus court chemin à l'intérieur du bloc
+        return regions.next_step(self.tile_i, self.tile_j, target_carrot.tile_i, target_carrot.tile_j)
 
     def path_to_partner(self, target_partner):
         """Trouve le prochain mouvement vers le partenaire ciblé"""
         if not target_partner:
             return None
 
+        # Cible dans un autre bloc de la carte : suivre le graphe de régions
+        if not regions.same_node(self.tile_i, self.tile_j, target_partner.tile_i, target_partner.tile_j):
+            return regions.next_step(self.tile_i, self.tile_j, target_partner.tile_i, target_partner.tile_j)
+
         # Calculer la direction générale vers le partenaire
         di = target_partner.tile_i - self.tile_i
         dj = target_partner.tile_j - self.tile_j
@@ -589,7 +1265,8 @@ class Villageois:
             if is_valid_tile(alt_i, alt_j):
                 return (alt_i, alt_j)
 
-        return None
+        # Obstacle : contourner par un plus court chemin à l'intérieur du bloc
+        return regions.next_step(self.tile_i, self.tile_j, target_partner.tile_i, target_partner.tile_j)
 
     def move_to_tile(self, target_i, target_j, others):
         """Commence le mouvement vers une tuile cible"""
@@ -626,6 +1303,7 @@ class Villageois:
         """Transforme un bébé en adulte"""
         if self.is_baby:
             self.is_baby = False
+            census.babies -= 1
             # Restaurer la taille adulte
             self.image_original = villager_sprite
             self.image_flipped = villager_sprite_flipped
@@ -637,40 +1315,17 @@ class Villageois:
             self.x = screen_x + (target_width - self.width) // 2
             self.y = screen_y + target_height - self.height
             self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+            matchmaker.refresh(self)
             print(f"Un bébé villageois est devenu adulte !")
 
     def can_reproduce(self):
         """Vérifie si le villageois peut se reproduire"""
         return (not self.is_baby and
-                self.carrots_collected >= 5 and
+                self.carrots_collected >= self.trait(REPRODUCTION_THRESHOLD) and
                 self.reproduction_timer <= 0 and
                 self.reproduction_state == "none")
 
-    def find_reproduction_partner(self, others):
-        """Trouve un partenaire pour la reproduction"""
-        available_partners = []
-        for other in others:
-            if (other is not self and
-                    other.can_reproduce() and
-                    other.reproduction_state == "none"):
-                available_partners.append(other)
-
-        if not available_partners:
-            return None
-
-        # Retourner le partenaire le plus proche
-        min_distance = float('inf')
-        nearest_partner = None
-
-        for partner in available_partners:
-            distance = abs(self.tile_i - partner.tile_i) + abs(self.tile_j - partner.tile_j)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_partner = partner
-
-        return nearest_partner
-
-    def try_reproduce(self, other_villager, all_villagers, particules):
+    def try_reproduce(self, other_villager, particules):
         """Tente de se reproduire avec un autre villageois"""
         # Distance permissive pour la reproduction (distance de Manhattan <= 2)
         distance = abs(self.tile_i - other_villager.tile_i) + abs(self.tile_j - other_villager.tile_j)
@@ -681,45 +1336,58 @@ class Villageois:
             center_y = (self.y + other_villager.y) // 2 + self.height // 2
 
             for _ in range(15):  # 15 particules de coeur
-                particules.append(Particle(center_x, center_y))
+                particules.acquire(center_x, center_y)
 
-            # Consommer les carottes
-            self.carrots_collected -= 5
-            other_villager.carrots_collected -= 5
+            # Consommer les carottes (chaque parent paie son propre seuil)
+            cost = self.trait(REPRODUCTION_THRESHOLD)
+            other_cost = other_villager.trait(REPRODUCTION_THRESHOLD)
+            self.carrots_collected -= cost
+            other_villager.carrots_collected -= other_cost
+            census.carrots_held -= cost + other_cost
 
             # Définir un timer de reproduction
             self.reproduction_timer = 300  # 5 secondes
             other_villager.reproduction_timer = 300
 
-            # Réinitialiser les états
-            self.reproduction_state = "none"
-            other_villager.reproduction_state = "none"
-            self.seeking_partner = False
-            other_villager.seeking_partner = False
-            self.target_partner = None
-            other_villager.target_partner = None
-
-            # Nettoyer les compteurs de blocage
-            if hasattr(self, 'reproduction_stuck_counter'):
-                delattr(self, 'reproduction_stuck_counter')
-            if hasattr(other_villager, 'reproduction_stuck_counter'):
-                delattr(other_villager, 'reproduction_stuck_counter')
+            # Réinitialiser les états et les compteurs de blocage des deux partenaires
+            matchmaker.release(self)
 
             # Créer un bébé à la position de l'un des parents (choix aléatoire)
             parent_pos = random.choice([(self.tile_i, self.tile_j), (other_villager.tile_i, other_villager.tile_j)])
-            baby = Villageois(all_villagers, is_baby=True, spawn_pos=parent_pos)
-            all_villagers.append(baby)
-
-            print(f"Un bébé villageois est né ! Population: {len(all_villagers)}")
+            # Le bébé réutilise un villageois libéré s'il y en a un et hérite des gènes des parents
+            genome = crossover(villagers.row(self, "genome"), villagers.row(other_villager, "genome"))
+            baby = villagers.acquire(villagers, is_baby=True, spawn_pos=parent_pos,
+                                     parents=(self.uid, other_villager.uid) if genealogy is not None else None)
+            villagers.set_row(baby, "genome", genome)
+            metrics.births += 1
+
+            print(f"Un bébé villageois est né ! Population: {len(villagers)}")
             return True
         else:
             # Distance trop grande, ne pas abandonner mais continuer à se rapprocher
             return False
 
+    def eat(self):
+        """Mange une carotte (ou une unité de la couche de nourriture)"""
+        self.carrots_collected += 1
+        census.carrots_held += 1
+        metrics.carrots_eaten += 1
+        matchmaker.refresh(self)
+        self.target_carrot = None
+        self.seeking_carrot = False
+
+        # Si c'est un bébé, vérifier s'il peut grandir
+        if self.is_baby:
+            self.age_carrots += 1
+            if self.age_carrots >= 3:
+                self.grow_up()
+        print(
+            f"{'Bébé' if self.is_baby else 'Villageois'} a collecté une carotte ! Total: {self.carrots_collected}")
+
     def execute_movement_action(self, target_tile, others, action_name):
-        """Exécute une action de mouvement avec 30% de chance de mouvement aléatoire"""
-        # 10% de chance de faire un mouvement aléatoire
-        if random.random() < 0.1:
+        """Exécute une action de mouvement, avec une part de mouvements aléatoires"""
+        # Probabilité de mouvement aléatoire héritée (10% chez les fondateurs)
+        if random.random() < self.trait(WANDER_PROBABILITY):
             adjacent_tiles = self.get_adjacent_tiles()
             if adjacent_tiles:
                 random_tile = random.choice(adjacent_tiles)
@@ -741,22 +1409,12 @@ class Villageois:
     def update(self, others, carrots, particles):
         if self.reproduction_timer > 0:
             self.reproduction_timer -= 1
+            if self.reproduction_timer == 0:
+                matchmaker.refresh(self)  # Fin du délai, le villageois redevient disponible
 
-        # Vérifier si on est sur une carotte
-        for carrot in carrots[:]:  # Copie de la liste pour éviter les problèmes de modification
-            if self.tile_i == carrot.tile_i and self.tile_j == carrot.tile_j:
-                carrots.remove(carrot)
-                self.carrots_collected += 1
-                self.target_carrot = None
-                self.seeking_carrot = False
-
-                # Si c'est un bébé, vérifier s'il peut grandir
-                if self.is_baby:
-                    self.age_carrots += 1
-                    if self.age_carrots >= 3:
-                        self.grow_up()
-                print(
-                    f"{'Bébé' if self.is_baby else 'Villageois'} a collecté une carotte ! Total: {self.carrots_collected}")
+        # Vérifier si on est sur une carotte (recherche directe par tuile)
+        for carrot in carrots.take_at(self.tile_i, self.tile_j):
+            self.eat()
 
         # Gestion du mouvement
         if self.moving:
@@ -769,24 +1427,29 @@ class Villageois:
             dy = target_y - self.y
             distance = math.sqrt(dx * dx + dy * dy)
 
-            if distance > self.speed:
-                self.x += (dx / distance) * self.speed
-                self.y += (dy / distance) * self.speed
+            # Le coût de déplacement du terrain de destination ralentit le villageois
+            speed = self.trait(SPEED) / MOVEMENT_COST[terrain_map[self.target_tile_i][self.target_tile_j]]
+            if distance > speed:
+                self.x += (dx / distance) * speed
+                self.y += (dy / distance) * speed
             else:
                 self.x = target_x
                 self.y = target_y
+                census.occupy(self.tile_i, self.tile_j, -1)
                 self.tile_i = self.target_tile_i
                 self.tile_j = self.target_tile_j
+                census.occupy(self.tile_i, self.tile_j, 1)
                 self.moving = False
                 self.state = "pause"
                 self.timer = random.randint(15, 60)
+                matchmaker.refresh(self)  # Changer de cellule dans le bassin des partenaires
 
                 # Vérifier si on a atteint le partenaire pour reproduction
                 if (self.reproduction_state == "seeking" and
                         self.target_partner and
-                        self.target_partner in others):
+                        matchmaker.is_paired(self, self.target_partner, others)):
 
-                    if self.try_reproduce(self.target_partner, others, particles):
+                    if self.try_reproduce(self.target_partner, particles):
                         pass  # Reproduction réussie
                     # Si la reproduction échoue, on continuera à essayer au prochain cycle
 
@@ -806,17 +1469,10 @@ class Villageois:
             if self.timer <= 0:
                 if self.state == "pause":
                     # PRIORITÉ 1: REPRODUCTION - Chercher un partenaire et se diriger vers lui
-                    if self.can_reproduce() and self.reproduction_state == "none":
-                        partner = self.find_reproduction_partner(others)
+                    if self.can_reproduce():
+                        # Le matchmaker marque les deux villageois comme cherchant à se reproduire
+                        partner = matchmaker.pair(self)
                         if partner:
-                            # Marquer les deux villageois comme cherchant à se reproduire
-                            self.target_partner = partner
-                            self.seeking_partner = True
-                            self.reproduction_state = "seeking"
-                            partner.target_partner = self
-                            partner.seeking_partner = True
-                            partner.reproduction_state = "seeking"
-
                             print(f"Villageois a trouvé un partenaire et se dirige vers lui pour reproduction")
 
                             # Se diriger vers le partenaire immédiatement
@@ -831,18 +1487,16 @@ class Villageois:
                         partner = self.target_partner
 
                         # Vérifier si le partenaire est toujours disponible
-                        if partner not in others or not partner.can_reproduce() or partner.reproduction_state != "seeking":
-                            # Le partenaire n'est plus disponible, annuler
-                            self.reproduction_state = "none"
-                            self.seeking_partner = False
-                            self.target_partner = None
+                        if not matchmaker.is_paired(self, partner, others):
+                            # Le partenaire n'est plus disponible, annuler pour les deux
+                            matchmaker.release(self)
                             print("Partenaire non disponible, annulation de la reproduction")
                             self.timer = random.randint(10, 30)
                         else:
                             distance = abs(self.tile_i - partner.tile_i) + abs(self.tile_j - partner.tile_j)
 
                             if distance <= 2:  # Assez proche pour se reproduire
-                                if self.try_reproduce(partner, others, particles):
+                                if self.try_reproduce(partner, particles):
                                     pass  # Reproduction réussie, arrêter ici
                                 else:
                                     # Se rapprocher encore
@@ -854,18 +1508,11 @@ class Villageois:
                                 next_tile = self.path_to_partner(partner)
                                 if not self.execute_movement_action(next_tile, others, "approach_partner"):
                                     # Mouvement bloqué, essayer des alternatives
-                                    if not hasattr(self, 'reproduction_stuck_counter'):
-                                        self.reproduction_stuck_counter = 0
                                     self.reproduction_stuck_counter += 1
 
                                     if self.reproduction_stuck_counter > 10:
                                         # Annuler la reproduction si trop bloqué
-                                        self.reproduction_state = "none"
-                                        self.seeking_partner = False
-                                        partner.reproduction_state = "none"
-                                        partner.seeking_partner = False
-                                        self.target_partner = None
-                                        partner.target_partner = None
+                                        matchmaker.release(self)
                                         print("Reproduction annulée - trop bloqué")
                                         self.timer = random.randint(30, 60)
                                     else:
@@ -873,17 +1520,10 @@ class Villageois:
 
                     # PRIORITÉ 2: CHERCHER DE LA NOURRITURE (seulement si pas de reproduction)
                     elif self.reproduction_state == "none":
-                        # Chercher une carotte si on n'en cherche pas déjà
-                        if not self.seeking_carrot and carrots:
-                            self.target_carrot = self.find_nearest_carrot(carrots)
-                            if self.target_carrot:
-                                self.seeking_carrot = True
-                                print(f"Villageois a trouvé une carotte et se dirige vers elle")
-
-                        # Se diriger vers la carotte
+                        # La carotte visée est attribuée par allocate_carrots (voir boucle principale)
                         if self.seeking_carrot and self.target_carrot:
-                            if self.target_carrot not in carrots:
-                                # La carotte n'existe plus
+                            if self.target_carrot.generation != self.target_carrot_generation:
+                                # La carotte a été mangée (l'objet a pu être réutilisé depuis)
                                 self.target_carrot = None
                                 self.seeking_carrot = False
                                 self.timer = random.randint(10, 30)
@@ -891,8 +1531,6 @@ class Villageois:
                                 next_tile = self.path_to_carrot(self.target_carrot)
                                 if not self.execute_movement_action(next_tile, others, "seek_carrot"):
                                     # Mouvement vers carotte bloqué
-                                    if not hasattr(self, 'carrot_stuck_counter'):
-                                        self.carrot_stuck_counter = 0
                                     self.carrot_stuck_counter += 1
 
                                     if self.carrot_stuck_counter > 5:
@@ -903,6 +1541,16 @@ class Villageois:
                                         self.timer = random.randint(10, 30)
                                     else:
                                         self.timer = random.randint(5, 15)
+                        elif (food_grid is not None and food_grid.reachable(self.tile_i, self.tile_j) and
+                              food_grid.distance[self.tile_i, self.tile_j] <= self.trait(SEARCH_RADIUS)):
+                            # Couche de nourriture : manger sur place, sinon descendre le champ de distances
+                            if food_grid.consume(self.tile_i, self.tile_j):
+                                self.eat()
+                                self.timer = random.randint(15, 60)
+                            else:
+                                next_tile = food_grid.step_towards(self.tile_i, self.tile_j)
+                                if not self.execute_movement_action(next_tile, others, "seek_food"):
+                                    self.timer = random.randint(5, 15)
                         else:
                             # PRIORITÉ 3: MOUVEMENT ALÉATOIRE
                             # Si aucune action spécifique, faire un mouvement aléatoire
@@ -926,91 +1574,63 @@ class Villageois:
         surface.blit(rotated, rect)
 
 
-# Création des villageois
+# Nombre de villageois au démarrage et après réinitialisation
 nb_villagois = 3
-villageois_list = []
-for _ in range(nb_villagois):
-    v = Villageois(villageois_list, is_baby=False)
-    villageois_list.append(v)
 
-# Création des carottes
-carrots_list = []
-carrot_spawn_timer = 0
+# Apparition des carottes
 MAX_CARROTS = 5
 CARROT_SPAWN_INTERVAL = 180  # Spawn une carotte toutes les 3 secondes (180 frames à 60 FPS)
 
-# Création des particules
-particles_list = []
+# Répartition de la nourriture entre les villageois
+FOOD_ALLOCATION_INTERVAL = 10  # Répartition des carottes toutes les 10 frames
+MAX_SEEKERS_PER_CARROT = 2  # Nombre maximum de villageois visant la même carotte
+FOOD_CANDIDATES = 3  # Nombre de carottes proches proposées par villageois
 
-# Instructions
-font = pygame.font.SysFont(None, 20)
-small_font = pygame.font.SysFont(None, 18)
-instructions = [
-    "Espace: Ajouter un villageois",
-    "R: Réinitialiser",
-    "C: Ajouter une carotte"
-]
+# Villageois vivants (liste dense) et villageois libérés réutilisés par les naissances,
+# avec le génome de chaque vivant dans une colonne d'octets (voir genome.py)
+villagers = Pool(Villageois, columns={"genome": FOUNDER_GENOME})
 
-# Boucle principale
-running = True
-while running:
-    screen.fill((40, 60, 80))
+# Naissances et morts de tous les villageois de la partie (voir genealogy.py)
+genealogy = Genealogy()
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                v = Villageois(villageois_list)
-                villageois_list.append(v)
-            elif event.key == pygame.K_r:
-                villageois_list = []
-                carrots_list = []
-                for _ in range(nb_villagois):
-                    v = Villageois(villageois_list)
-                    villageois_list.append(v)
-            elif event.key == pygame.K_c:
-                if len(carrots_list) < MAX_CARROTS:
-                    carrots_list.append(Carrot())
-
-    # Spawn automatique des carottes
-    carrot_spawn_timer += 1
-    if carrot_spawn_timer >= CARROT_SPAWN_INTERVAL and len(carrots_list) < MAX_CARROTS:
-        carrots_list.append(Carrot())
-        carrot_spawn_timer = 0
+# Bassin des villageois prêts à se reproduire
+matchmaker = Matchmaker()
 
-    # Dessiner la carte (terrains uniquement, sans les arbres)
-    draw_iso_map()
+# Compteurs de la population pour l'affichage (dimensionnés au chargement de la carte)
+census = Census()
 
-    # Mettre à jour et dessiner les carottes
-    for carrot in carrots_list:
-        carrot.update()
-        carrot.draw(screen)
+# Couche de nourriture par tuile (--food-grid, voir food.py), remplace les carottes
+food_grid = None
 
-    # Mettre à jour les villageois
-    for v in villageois_list:
-        v.update(villageois_list, carrots_list, particles_list)
+# Carottes et particules de la partie, réutilisées via leurs pools
+carrots = CarrotStore()
+particles = Pool(Particle)
 
-        # Mettre à jour les particules
-        particles_list = [p for p in particles_list if p.is_alive()]
-        for particle in particles_list:
-            particle.update()
+# Pas de simulation effectués et minuteries de la boucle (sauvegardés dans les instantanés)
+tick = 0
+carrot_spawn_timer = 0
+food_allocation_timer = 0
 
-    # Trier les villageois par profondeur (i + j) - les plus petites valeurs en premier
-    sorted_villagers = sorted(villageois_list, key=lambda v: v.tile_i + v.tile_j)
+# Compteurs exportés par le sous-système de métriques
+metrics = Metrics()
 
-    # Dessiner les villageois dans l'ordre de profondeur
-    for v in sorted_villagers:
-        v.draw(screen)
+# Moyennes des traits affichées par le HUD : (pas du calcul, résumé), refaites tous les HUD_TRAITS_INTERVAL pas
+HUD_TRAITS_INTERVAL = 60
+hud_traits = None
 
-    # Dessiner les particules
-    for particle in particles_list:
-        particle.draw(screen)
+# Instructions
+instructions = [
+    "Espace: Ajouter un villageois",
+    "R: Réinitialiser",
+    "C: Ajouter une carotte",
+    "Clic: peindre le terrain (W/B/T/G: choisir)",
+    "Molette ou +/-: zoom"
+]
 
-    # Dessiner les arbres en dernier pour qu'ils apparaissent au-dessus des villageois
-    draw_trees()
 
-    # Afficher les instructions
+def draw_hud(villageois_list, carrots_list, font, small_font, detail="full"):
+    """Affiche les instructions et les statistiques de la simulation"""
+    global hud_traits
     for i, text in enumerate(instructions):
         if i < 2:
             text_surface = font.render(text, True, (255, 255, 255))
@@ -1019,40 +1639,487 @@ while running:
             text_surface = small_font.render(text, True, (255, 255, 255))
             screen.blit(text_surface, (10, 10 + i * 25))
 
-        # Afficher les infos
-        adult_count = sum(1 for v in villageois_list if not v.is_baby)
-        baby_count = sum(1 for v in villageois_list if v.is_baby)
+    # Afficher les infos (compteurs tenus à jour par census, sans parcourir les villageois)
+    baby_count = census.babies
+    adult_count = len(villageois_list) - baby_count
 
-        count_text = f"Adultes: {adult_count} | Bébés: {baby_count}"
-        count_surface = font.render(count_text, True, (255, 255, 255))
-        screen.blit(count_surface, (WINDOW_WIDTH - count_surface.get_width() - 10, 10))
+    count_text = f"Adultes: {adult_count} | Bébés: {baby_count}"
+    count_surface = font.render(count_text, True, (255, 255, 255))
+    screen.blit(count_surface, (WINDOW_WIDTH - count_surface.get_width() - 10, 10))
 
-        map_info = f"Carte: {MAP_ROWS}x{MAP_COLS}"
-        map_surface = small_font.render(map_info, True, (255, 255, 255))
-        screen.blit(map_surface, (WINDOW_WIDTH - map_surface.get_width() - 10, 35))
+    map_info = f"Carte: {MAP_ROWS}x{MAP_COLS}"
+    map_surface = small_font.render(map_info, True, (255, 255, 255))
+    screen.blit(map_surface, (WINDOW_WIDTH - map_surface.get_width() - 10, 35))
 
-        # Afficher les infos des carottes
+    # Afficher les infos des carottes
+    if food_grid is not None:
+        carrot_info = f"Nourriture: {food_grid.total()}"
+    else:
         carrot_info = f"Carottes: {len(carrots_list)}/{MAX_CARROTS}"
-        carrot_surface = small_font.render(carrot_info, True, (255, 255, 255))
-        screen.blit(carrot_surface, (WINDOW_WIDTH - carrot_surface.get_width() - 10, 55))
+    carrot_surface = small_font.render(carrot_info, True, (255, 255, 255))
+    screen.blit(carrot_surface, (WINDOW_WIDTH - carrot_surface.get_width() - 10, 55))
+
+    # Afficher le total de carottes collectées
+    total_collected = census.carrots_held
+    collected_info = f"Collectées: {total_collected}"
+    collected_surface = small_font.render(collected_info, True, (255, 255, 255))
+    screen.blit(collected_surface, (WINDOW_WIDTH - collected_surface.get_width() - 10, 75))
+
+    # Afficher les villageois prêts à se reproduire (le bassin contient exactement ceux-là)
+    ready_to_reproduce = len(matchmaker.pool)
+    reproduce_info = f"Prêts reproduction: {ready_to_reproduce}"
+    reproduce_surface = small_font.render(reproduce_info, True, (255, 255, 255))
+    screen.blit(reproduce_surface, (WINDOW_WIDTH - reproduce_surface.get_width() - 10, 95))
+
+    # Afficher la moyenne des traits héréditaires de la population (recalculée une fois par seconde)
+    if hud_traits is None or not 0 <= tick - hud_traits[0] < HUD_TRAITS_INTERVAL:
+        hud_traits = (tick, summary(villagers.columns["genome"]))
+    traits = hud_traits[1]
+    genome_info = (f"Vitesse: {traits['speed'][0]:.2f} | Seuil: {traits['reproduction_threshold'][0]:.1f} | "
+                   f"Rayon: {traits['search_radius'][0]:.0f} | Errance: {traits['wander_probability'][0]:.2f}")
+    genome_surface = small_font.render(genome_info, True, (255, 255, 255))
+    screen.blit(genome_surface, (WINDOW_WIDTH - genome_surface.get_width() - 10, 115))
+
+    detail_names = {"full": "complet", "reduced": "réduit", "density": "densité"}
+    view_info = f"Zoom: {view_zoom:g} | Détail: {detail_names[detail]}"
+    view_surface = small_font.render(view_info, True, (255, 255, 255))
+    screen.blit(view_surface, (WINDOW_WIDTH - view_surface.get_width() - 10, 135))
+
+
+def draw_scene(font, small_font):
+    """Dessine une image complète de la partie sur `screen`, au niveau de détail adapté à la vue"""
+    detail, visible = detail_level()
+
+    if detail == "density":
+        draw_density()
+    elif detail == "reduced":
+        # Sprites réduits mis en cache, sans rotation ni particules ; arbres dessinés avec la carte
+        if view_zoom == 1:
+            draw_iso_map()
+        else:
+            draw_zoomed_terrain()
+        if food_grid is not None:
+            draw_food()
+        for carrot in carrots:
+            blit_view(carrot.sprite, carrot.x, carrot.y)
+        for v in sorted(visible, key=lambda v: v.tile_i + v.tile_j):
+            blit_view(v.current_image, v.x, v.y)
+        if view_zoom == 1:
+            draw_trees()
+    else:
+        # Dessiner la carte (terrains uniquement, sans les arbres) : couvre tout l'écran
+        draw_iso_map()
+
+        if food_grid is not None:
+            draw_food()
+
+        # Mettre à jour et dessiner les carottes
+        for carrot in carrots:
+            carrot.update()
+            carrot.draw(screen)
+
+        # Trier les villageois par profondeur (i + j) - les plus petites valeurs en premier
+        sorted_villagers = sorted(villagers, key=lambda v: v.tile_i + v.tile_j)
+
+        # Dessiner les villageois dans l'ordre de profondeur
+        for v in sorted_villagers:
+            v.draw(screen)
 
-        # Afficher le total de carottes collectées
-        total_collected = sum(v.carrots_collected for v in villageois_list)
-        collected_info = f"Collectées: {total_collected}"
-        collected_surface = small_font.render(collected_info, True, (255, 255, 255))
-        screen.blit(collected_surface, (WINDOW_WIDTH - collected_surface.get_width() - 10, 75))
+        # Dessiner les particules
+        for particle in particles:
+            particle.draw(screen)
 
-        # Afficher les villageois prêts à se reproduire
-        ready_to_reproduce = sum(1 for v in villageois_list if v.can_reproduce())
-        reproduce_info = f"Prêts reproduction: {ready_to_reproduce}"
-        reproduce_surface = small_font.render(reproduce_info, True, (255, 255, 255))
-        screen.blit(reproduce_surface, (WINDOW_WIDTH - reproduce_surface.get_width() - 10, 95))
+        # Dessiner les arbres en dernier pour qu'ils apparaissent au-dessus des villageois
+        draw_trees()
 
-    pygame.display.flip()
-    clock.tick(60)
+    draw_hud(villagers, carrots, font, small_font, detail)
 
-pygame.quit()
-sys.exit()
 
+def render_frame(target, font, small_font):
+    """Dessine une image de la partie sur la surface `target` au lieu de l'écran"""
+    global screen
+    window, screen = screen, target
+    try:
+        draw_scene(font, small_font)
+    finally:
+        screen = window
+
+
+def print_genome_summary():
+    """Affiche la moyenne et l'histogramme de chaque trait de la population"""
+    print(f"Génomes de {len(villagers)} villageois :")
+    for name, (mean, histogram) in summary(villagers.columns["genome"]).items():
+        print(f"  {name}: moyenne {mean:.3f}, histogramme {histogram}")
+
+
+def apply_input(kind, *args):
+    """Applique une action du joueur (voir les types INPUT_* de journal.py)"""
+    if kind == INPUT_SPAWN:
+        villagers.acquire(villagers)
+    elif kind == INPUT_RESET:
+        for v in villagers:
+            genealogy.record_death(v.uid, tick)
+        villagers.clear()
+        carrots.clear()
+        matchmaker.clear()
+        if food_grid is not None:
+            food_grid.refill()
+        for _ in range(nb_villagois):
+            villagers.acquire(villagers)
+    elif kind == INPUT_CARROT:
+        if len(carrots) < MAX_CARROTS:
+            carrots.spawn()
+            metrics.carrots_spawned += 1
+    elif kind == INPUT_PAINT:
+        set_tile(*args)
+
+
+def simulate_tick():
+    """Fait avancer la partie d'un pas (tout ce qui ne dépend pas de l'affichage)"""
+    global tick, carrot_spawn_timer, food_allocation_timer
+
+    # Spawn automatique des carottes (la couche de nourriture repousse toute seule)
+    carrot_spawn_timer += 1
+    if food_grid is not None:
+        food_grid.update()
+    elif carrot_spawn_timer >= CARROT_SPAWN_INTERVAL and len(carrots) < MAX_CARROTS:
+        carrots.spawn()
+        metrics.carrots_spawned += 1
+        carrot_spawn_timer = 0
+
+    # Répartition globale des carottes entre les villageois affamés
+    food_allocation_timer += 1
+    if food_allocation_timer >= FOOD_ALLOCATION_INTERVAL:
+        allocate_carrots(villagers, carrots)
+        food_allocation_timer = 0
 
+    # Mettre à jour les villageois
+    for v in villagers:
+        v.update(villagers, carrots, particles)
+
+        # Mettre à jour les particules (à rebours : une particule expirée est
+        # remplacée par la dernière de la liste, déjà mise à jour)
+        for particle in reversed(particles.items):
+            if particle.is_alive():
+                particle.update()
+            else:
+                particles.release(particle)
+
+    tick += 1
+
+
+def state_hash():
+    """Empreinte de l'état de la partie (villageois, carottes, générateur aléatoire)"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr([(v.tile_i, v.tile_j, v.target_tile_i, v.target_tile_j, round(v.x, 6), round(v.y, 6),
+                         v.state, v.timer, v.is_baby, v.carrots_collected, v.reproduction_state,
+                         v.reproduction_timer) for v in villagers]).encode())
+    digest.update(repr([(c.tile_i, c.tile_j) for c in carrots]).encode())
+    digest.update(villagers.columns["genome"])
+    digest.update(repr(random.getstate()).encode())
+    return int.from_bytes(digest.digest(), 'little')
+
+
+def named_sprites():
+    """Sprites partagés, désignés par leur nom dans les instantanés"""
+    baby, baby_flipped = villager_images(True)
+    return {"villager": villager_sprite, "villager_flipped": villager_sprite_flipped,
+            "baby": baby, "baby_flipped": baby_flipped, "carrot": carrot_sprite, "heart": heart_sprite}
+
+
+def save_snapshot():
+    """Sérialise l'état complet de la partie"""
+    state = {
+        "terrain_map": terrain_map, "regions": regions, "food_grid": food_grid,
+        "villagers": villagers, "matchmaker": matchmaker, "carrots": carrots, "particles": particles,
+        "genealogy": genealogy, "tick": tick, "carrot_spawn_timer": carrot_spawn_timer, "food_allocation_timer": food_allocation_timer,
+        "random": random.getstate(),
+    }
+    # Les villageois gardent leur partenaire et leur carotte (contrairement au mode réparti)
+    return dump_snapshot(state, named_sprites(), full_state_types=(Villageois,))
+
+
+def restore_snapshot(data):
+    """Remplace l'état de la partie par celui d'un instantané"""
+    global terrain_map, regions, food_grid, villagers, matchmaker, carrots, particles, genealogy
+    global tick, carrot_spawn_timer, food_allocation_timer, terrain_surface, density_base, density_diamond
+
+    state = load_snapshot(data, named_sprites())
+    terrain_map, regions, food_grid = state["terrain_map"], state["regions"], state["food_grid"]
+    villagers, matchmaker = state["villagers"], state["matchmaker"]
+    carrots, particles = state["carrots"], state["particles"]
+    genealogy = state["genealogy"]
+    tick = state["tick"]
+    carrot_spawn_timer = state["carrot_spawn_timer"]
+    food_allocation_timer = state["food_allocation_timer"]
+    random.setstate(state["random"])
+    terrain_surface = None  # La carte a pu être modifiée : à redessiner
+    zoomed_terrain.clear()
+    density_base = density_diamond = None
+    census.clear(MAP_ROWS, MAP_COLS)
+    for v in villagers:
+        census.add(v)
+
+
+def positive_int(text):
+    """Type argparse : entier strictement positif"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"entier strictement positif attendu : {text}")
+    return value
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulation de villageois sur carte isométrique")
+    parser.add_argument("--map", default="map/map.txt", help="carte à charger (format texte ou binaire)")
+    parser.add_argument("--headless", action="store_true",
+                        help="simuler sans affichage et sans limite de 60 FPS")
+    parser.add_argument("--ticks", type=int, default=0,
+                        help="arrêter la simulation après ce nombre de pas (0 = jamais)")
+    parser.add_argument("--villagers", type=int, default=nb_villagois, help="nombre de villageois au départ")
+    parser.add_argument("--food-grid", action="store_true",
+                        help="remplacer les carottes par une couche de nourriture qui repousse (nécessite numpy)")
+    parser.add_argument("--seed", type=int, help="graine du générateur aléatoire (tirée au hasard sinon)")
+    parser.add_argument("--journal", help="enregistrer la graine et les actions dans ce journal")
+    parser.add_argument("--hash-interval", type=int, default=60,
+                        help="pas entre deux empreintes de l'état dans le journal (1 = chaque pas)")
+    parser.add_argument("--snapshot-interval", type=int, default=3600,
+                        help="pas entre deux instantanés de l'état complet (0 = aucun)")
+    parser.add_argument("--replay", metavar="JOURNAL",
+                        help="rejouer un journal sans affichage et vérifier les empreintes")
+    parser.add_argument("--replay-from", type=int, default=0, metavar="PAS",
+                        help="reprendre le rejeu depuis l'instantané le plus proche de ce pas")
+    parser.add_argument("--genealogy", metavar="FICHIER",
+                        help="écrire la généalogie de la partie dans ce fichier en fin de simulation")
+    parser.add_argument("--record", metavar="SORTIE",
+                        help="enregistrer la partie : dossier d'images PNG, ou vidéo (.mp4...) avec ffmpeg")
+    parser.add_argument("--record-every", type=positive_int, default=2, metavar="N",
+                        help="enregistrer une image tous les N pas")
+    parser.add_argument("--record-workers", type=int,
+                        help="processus d'encodage des images PNG (un par coeur par défaut)")
+    parser.add_argument("--zoom", type=float, default=1.0, choices=ZOOM_LEVELS,
+                        help="zoom de la vue au démarrage (molette ou +/- ensuite)")
+    parser.add_argument("--stream-port", type=int,
+                        help="diffuser l'état de la partie aux visionneuses (viewer.py) sur ce port")
+    parser.add_argument("--stream-host", default="127.0.0.1", help="adresse d'écoute de la diffusion")
+    parser.add_argument("--stream-interval", type=positive_int, default=1, metavar="N",
+                        help="diffuser un delta tous les N pas")
+    parser.add_argument("--shards", metavar="LIGNESxCOLONNES",
+                        help="répartir la carte en régions simulées par plusieurs processus (ex: 2x2) ; "
+                             "les couples ne se forment qu'à l'intérieur d'une région, les naissances "
+                             "diffèrent donc d'une partie en un seul processus")
+    parser.add_argument("--metrics-port", type=int, help="exposer les métriques Prometheus sur ce port local")
+    parser.add_argument("--metrics-socket", help="exposer les métriques Prometheus sur ce socket Unix")
+    parser.add_argument("--metrics-csv", help="ajouter périodiquement les métriques à ce fichier CSV")
+    parser.add_argument("--metrics-interval", type=float, default=1.0,
+                        help="intervalle d'échantillonnage des métriques en secondes")
+    return parser.parse_args()
+
+
+def main():
+    global screen, food_grid, painted_tiles
+
+    args = parse_args()
+
+    # Rejeu : les réglages et la graine viennent du journal
+    player = None
+    if args.replay:
+        player = JournalReader(args.replay)
+        args.map = player.settings["map"]
+        args.villagers = player.settings["villagers"]
+        args.food_grid = player.settings["food_grid"]
+        args.seed = player.seed
+        args.headless = True
+        args.journal = None
+    if args.seed is None:
+        args.seed = int.from_bytes(os.urandom(4), 'little')
+    random.seed(args.seed)
+
+    if args.metrics_port is not None or args.metrics_socket or args.metrics_csv:
+        metrics.start(interval=args.metrics_interval, port=args.metrics_port,
+                      socket_path=args.metrics_socket, csv_path=args.metrics_csv)
+
+    if args.shards:
+        # Mode réparti : toujours sans affichage, un processus par région
+        shard_rows, shard_cols = (int(n) for n in args.shards.lower().split('x'))
+        run_sharded(args.map, shard_rows, shard_cols, args.ticks, args.villagers, metrics,
+                    MAX_CARROTS, CARROT_SPAWN_INTERVAL)
+        metrics.stop()
+        sys.exit()
+
+    if args.headless:
+        # Pilote vidéo factice : les sprites sont chargés mais rien n'est affiché
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption("Villageois sur carte isométrique personnalisée")
+    clock = pygame.time.Clock()
+
+    # Charger les images en arrière-plan pendant la lecture de la carte
+    asset_loader = AssetLoader()
+    request_sprites(asset_loader)
+    load_map_from_file(args.map)
+    load_sprites(asset_loader)
+
+    if args.food_grid:
+        from food import FoodGrid  # numpy n'est nécessaire qu'avec la couche de nourriture
+        food_grid = FoodGrid(terrain_map)
+    set_zoom(args.zoom)
+
+    # Création des villageois
+    for _ in range(args.villagers):
+        villagers.acquire(villagers, is_baby=False)
+
+    journal = None
+    if args.journal:
+        journal = JournalWriter(args.journal, args.seed, {
+            "map": args.map, "villagers": args.villagers, "food_grid": args.food_grid})
+        print(f"Journal de la partie: {args.journal} (graine {args.seed})")
+
+    if player is not None:
+        print(f"Rejeu de {args.replay}: graine {player.seed}, {player.end_tick} pas")
+        if args.replay_from:
+            snapshot = player.snapshot_before(args.replay_from)
+            if snapshot is None:
+                print("Aucun instantané avant ce pas, rejeu depuis le début")
+            else:
+                restore_snapshot(snapshot[1])
+                print(f"Reprise depuis l'instantané du pas {tick}")
+
+    # Terrain peint au clic (touches W, B, T et G pour le changer)
+    brush_keys = {pygame.K_w: 'W', pygame.K_b: 'B', pygame.K_t: 'T', pygame.K_g: 'G'}
+    brush = TILE_BY_CHAR['W'].id
+
+    font = pygame.font.SysFont(None, 20)
+    small_font = pygame.font.SysFont(None, 18)
+
+    # Les jauges sont calculées par le thread d'échantillonnage, pas par la boucle principale
+    metrics.source = lambda: {
+        "population": len(villagers),
+        "babies": census.babies,
+        "carrots": len(carrots) if food_grid is None else food_grid.total(),
+    }
+
+    recorder = None
+    if args.record:
+        recorder = FrameRecorder(args.record, WINDOW_WIDTH, WINDOW_HEIGHT, workers=args.record_workers,
+                                 fps=max(1, 60 // args.record_every))
+        print(f"Enregistrement d'une image tous les {args.record_every} pas dans {args.record}")
+
+    streamer = None
+    if args.stream_port is not None:
+        streamer = StreamServer(args.stream_host, args.stream_port)
+        streamer.start()
+        painted_tiles = []
+        print(f"Diffusion de la partie sur {args.stream_host}:{streamer.port} (python viewer.py)")
+
+    # Boucle principale
+    running = True
+    verified = 0  # Empreintes vérifiées pendant le rejeu
+    while running:
+        frame_start = time.perf_counter()
+
+        # Actions du joueur : lues dans le journal en rejeu, sinon au clavier et à la souris
+        inputs = []
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    inputs.append((INPUT_SPAWN, ()))
+                elif event.key == pygame.K_r:
+                    inputs.append((INPUT_RESET, ()))
+                elif event.key == pygame.K_c:
+                    inputs.append((INPUT_CARROT, ()))
+                elif event.key in brush_keys:
+                    brush = TILE_BY_CHAR[brush_keys[event.key]].id
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    set_zoom(ZOOM_LEVELS[max(ZOOM_LEVELS.index(view_zoom) - 1, 0)])
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    set_zoom(ZOOM_LEVELS[min(ZOOM_LEVELS.index(view_zoom) + 1, len(ZOOM_LEVELS) - 1)])
+            elif event.type == pygame.MOUSEWHEEL:
+                level = ZOOM_LEVELS.index(view_zoom) - event.y
+                set_zoom(ZOOM_LEVELS[min(max(level, 0), len(ZOOM_LEVELS) - 1)])
+            elif ((event.type == pygame.MOUSEBUTTONDOWN and event.button == 1) or
+                  (event.type == pygame.MOUSEMOTION and event.buttons[0])):
+                i, j = tile_at_screen(*event.pos)
+                if 0 <= i < MAP_ROWS and 0 <= j < MAP_COLS:
+                    inputs.append((INPUT_PAINT, (i, j, brush)))
+        if player is not None:
+            inputs = player.inputs.get(tick, [])
+
+        for kind, input_args in inputs:
+            if journal is not None:
+                journal.record(tick, kind, *input_args)
+            apply_input(kind, *input_args)
+
+        simulate_tick()
+
+        if journal is not None:
+            if args.hash_interval and tick % args.hash_interval == 0:
+                journal.record_hash(tick, state_hash())
+            if args.snapshot_interval and tick % args.snapshot_interval == 0:
+                journal.record_snapshot(tick, save_snapshot())
+
+        # Rien n'est calculé pour la diffusion tant qu'aucune visionneuse n'est connectée
+        # (une nouvelle visionneuse reçoit le terrain entier dans son image clé)
+        if streamer is not None and tick % args.stream_interval == 0:
+            if streamer.has_clients():
+                streamer.publish(tick, terrain_map,
+                                 [(v.uid, v.tile_i, v.tile_j, v.is_baby, v.state) for v in villagers],
+                                 carrots.by_tile, painted_tiles)
+            painted_tiles.clear()
+
+        if player is not None:
+            expected = player.hashes.get(tick)
+            if expected is not None and expected != state_hash():
+                previous = max((t for t in player.hashes if t < tick), default=0)
+                print(f"Divergence au pas {tick} (dernière empreinte identique au pas {previous})")
+                running = False
+            else:
+                verified += expected is not None
+                if tick >= player.end_tick:
+                    print(f"Rejeu conforme: {verified} empreintes vérifiées jusqu'au pas {tick}")
+                    running = False
+
+        if recorder is not None and tick % args.record_every == 0:
+            # Image dessinée directement dans la mémoire partagée avec les encodeurs
+            slot, pixels = recorder.acquire()
+            frame = pygame.image.frombuffer(pixels, (WINDOW_WIDTH, WINDOW_HEIGHT), 'BGRA')
+            render_frame(frame, font, small_font)
+            if not args.headless:
+                screen.blit(frame, (0, 0))
+            del frame
+            pixels.release()
+            recorder.submit(slot)
+        elif not args.headless:
+            draw_scene(font, small_font)
+
+        metrics.record_frame(time.perf_counter() - frame_start)
+        if args.ticks and tick >= args.ticks:
+            running = False
 
+        if not args.headless:
+            pygame.display.flip()
+            clock.tick(60)
+
+    if journal is not None:
+        journal.close(tick)
+    if streamer is not None:
+        streamer.stop()
+    if recorder is not None:
+        recorder.close()
+        print(f"{recorder.frames} images enregistrées dans {args.record}")
+    if args.genealogy:
+        genealogy.save(args.genealogy)
+        print(f"Généalogie ({len(genealogy)} naissances) écrite dans {args.genealogy}")
+    if args.headless:
+        print_genome_summary()
+    metrics.stop()
+    pygame.quit()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    main()
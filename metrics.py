@@ -0,0 +1,229 @@
+"""Métriques de la simulation exportées au format Prometheus et en CSV
+
+La boucle de simulation ne fait qu'incrémenter des compteurs entiers. Un thread
+d'échantillonnage calcule les débits et remplit des tampons circulaires de
+taille fixe, et un thread serveur répond aux requêtes HTTP (port TCP local ou
+socket Unix) : la simulation n'est jamais ralentie par la collecte.
+"""
+import csv
+import os
+import socketserver
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Nom de la série, type Prometheus, description
+SERIES = [
+    ("population", "gauge", "Nombre de villageois"),
+    ("babies", "gauge", "Nombre de bébés"),
+    ("carrots", "gauge", "Carottes présentes sur la carte"),
+    ("births_per_second", "gauge", "Naissances par seconde"),
+    ("carrots_spawned_per_second", "gauge", "Carottes apparues par seconde"),
+    ("carrots_eaten_per_second", "gauge", "Carottes mangées par seconde"),
+    ("search_distance_mean", "gauge", "Distance moyenne aux carottes attribuées (en tuiles)"),
+    ("ticks_per_second", "gauge", "Pas de simulation par seconde"),
+    ("frame_time_seconds", "gauge", "Durée moyenne d'un pas de simulation"),
+]
+
+COUNTERS = [
+    ("ticks", "Pas de simulation effectués"),
+    ("births", "Naissances"),
+    ("carrots_spawned", "Carottes apparues"),
+    ("carrots_eaten", "Carottes mangées"),
+]
+
+
+class RingBuffer:
+    """Tampon circulaire de flottants de taille fixe"""
+
+    def __init__(self, size):
+        self.data = array('d', bytes(8 * size))
+        self.size = size
+        self.count = 0  # Nombre total de valeurs ajoutées
+
+    def append(self, value):
+        self.data[self.count % self.size] = value
+        self.count += 1
+
+    def last(self):
+        return self.data[(self.count - 1) % self.size] if self.count else 0.0
+
+    def values(self):
+        """Renvoie les valeurs conservées, de la plus ancienne à la plus récente"""
+        if self.count <= self.size:
+            return self.data[:self.count].tolist()
+        start = self.count % self.size
+        return (self.data[start:] + self.data[:start]).tolist()
+
+
+class Metrics:
+    def __init__(self, history=600):
+        # Compteurs incrémentés par la boucle de simulation
+        self.ticks = 0
+        self.births = 0
+        self.carrots_spawned = 0
+        self.carrots_eaten = 0
+        self.search_distance_total = 0
+        self.search_count = 0
+        self.frame_time_total = 0.0
+
+        self.source = None  # Fonction renvoyant les jauges (population, bébés, carottes)
+        self.buffers = {name: RingBuffer(history) for name, _, _ in SERIES}
+        self.timestamps = RingBuffer(history)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.servers = []
+        self.socket_path = None
+
+    def record_frame(self, frame_time):
+        """Appelé une fois par pas de simulation"""
+        self.ticks += 1
+        self.frame_time_total += frame_time
+
+    def start(self, interval=1.0, port=None, socket_path=None, csv_path=None, csv_interval=10.0):
+        """Démarre l'échantillonnage et, si demandé, le serveur et l'export CSV"""
+        sampler = threading.Thread(target=self._sample_loop, args=(interval, csv_path, csv_interval),
+                                   name="metrics-sampler", daemon=True)
+        self.threads.append(sampler)
+
+        if port is not None:
+            self.servers.append(ThreadingHTTPServer(("127.0.0.1", port), self._handler()))
+            print(f"Métriques disponibles sur http://127.0.0.1:{port}/metrics")
+        if socket_path is not None:
+            if _UnixHTTPServer is None:
+                print("Les sockets Unix ne sont pas disponibles sur cette plateforme")
+            else:
+                if os.path.exists(socket_path):
+                    os.remove(socket_path)
+                self.servers.append(_UnixHTTPServer(socket_path, self._handler()))
+                self.socket_path = socket_path
+                print(f"Métriques disponibles sur le socket {socket_path}")
+
+        for server in self.servers:
+            self.threads.append(threading.Thread(target=server.serve_forever, name="metrics-server",
+                                                 daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        for thread in self.threads:
+            thread.join(timeout=2)
+
+    def _sample_loop(self, interval, csv_path, csv_interval):
+        previous = self._snapshot()
+        previous_time = time.monotonic()
+        last_flush = previous_time
+        flushed = 0  # Nombre d'échantillons déjà écrits dans le CSV
+
+        while not self.stop_event.wait(interval):
+            now = time.monotonic()
+            current = self._snapshot()
+            self._sample(previous, current, now - previous_time)
+            previous, previous_time = current, now
+
+            if csv_path and now - last_flush >= csv_interval:
+                flushed = self._flush_csv(csv_path, flushed)
+                last_flush = now
+
+        if csv_path:
+            self._flush_csv(csv_path, flushed)
+
+    def _snapshot(self):
+        return (self.ticks, self.births, self.carrots_spawned, self.carrots_eaten,
+                self.search_distance_total, self.search_count, self.frame_time_total)
+
+    def _sample(self, previous, current, elapsed):
+        ticks, births, spawned, eaten, distance, searches, frame_time = (
+            c - p for c, p in zip(current, previous))
+        gauges = self.source() if self.source else {}
+        elapsed = max(elapsed, 1e-9)
+
+        values = {
+            "population": gauges.get("population", 0),
+            "babies": gauges.get("babies", 0),
+            "carrots": gauges.get("carrots", 0),
+            "births_per_second": births / elapsed,
+            "carrots_spawned_per_second": spawned / elapsed,
+            "carrots_eaten_per_second": eaten / elapsed,
+            "search_distance_mean": distance / searches if searches else 0.0,
+            "ticks_per_second": ticks / elapsed,
+            "frame_time_seconds": frame_time / ticks if ticks else 0.0,
+        }
+        with self.lock:
+            self.timestamps.append(time.time())
+            for name, value in values.items():
+                self.buffers[name].append(value)
+
+    def _flush_csv(self, path, flushed):
+        """Ajoute au fichier CSV les échantillons apparus depuis la dernière écriture"""
+        with self.lock:
+            total = self.timestamps.count
+            # Les échantillons plus anciens que la taille du tampon sont perdus
+            missing = min(total - flushed, self.timestamps.size)
+            if missing <= 0:
+                return total
+            columns = [self.timestamps.values()[-missing:]]
+            columns += [self.buffers[name].values()[-missing:] for name, _, _ in SERIES]
+        rows = list(zip(*columns))
+
+        new_file = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["timestamp"] + [name for name, _, _ in SERIES])
+            writer.writerows(rows)
+        return total
+
+    def prometheus_text(self):
+        """Renvoie les dernières valeurs au format texte de Prometheus"""
+        lines = []
+        for name, description in COUNTERS:
+            lines.append(f"# HELP village_{name}_total {description}")
+            lines.append(f"# TYPE village_{name}_total counter")
+            lines.append(f"village_{name}_total {getattr(self, name)}")
+        with self.lock:
+            for name, kind, description in SERIES:
+                lines.append(f"# HELP village_{name} {description}")
+                lines.append(f"# TYPE village_{name} {kind}")
+                lines.append(f"village_{name} {self.buffers[name].last():g}")
+        return "\n".join(lines) + "\n"
+
+    def _handler(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Pas de journal pour chaque requête
+
+        return Handler
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def get_request(self):
+            # BaseHTTPRequestHandler attend une adresse client sous forme de tuple
+            request, _ = super().get_request()
+            return request, ("unix", 0)
+else:
+    _UnixHTTPServer = None
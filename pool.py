@@ -0,0 +1,107 @@
+"""Pools d'entités réutilisables (villageois, carottes, particules)
+
+Les entités vivantes sont rangées dans une liste dense : une suppression
+échange l'entité avec la dernière de la liste, en O(1). Les entités
+supprimées sont gardées dans une liste libre et réinitialisées (méthode
+`reset`, avec les arguments du constructeur) à la prochaine création, au lieu
+d'allouer de nouveaux objets. Une entité peut définir une méthode `retire`,
+appelée juste avant sa libération pour défaire ses liens avec les autres.
+
+Chaque entité porte un compteur de génération, incrémenté à chaque
+libération : une référence accompagnée de sa génération (par exemple la
+carotte visée par un villageois) cesse d'être valide dès que l'entité est
+libérée, même si l'objet est réutilisé ensuite.
+
+Un pool peut aussi porter des colonnes d'octets : une ligne de largeur fixe
+par entité vivante, rangée dans le même ordre que la liste dense (et déplacée
+avec elle lors des suppressions). Les données de toute la population se
+lisent alors d'un bloc, sans parcourir les entités.
+"""
+
+
+class Pool:
+    def __init__(self, factory, columns=None):
+        self.factory = factory  # Classe (ou fonction) qui crée une entité neuve
+        self.items = []  # Entités vivantes (liste dense)
+        self.free = []  # Entités libérées, prêtes à être réutilisées
+        self.defaults = dict(columns or {})  # Nom de colonne -> ligne par défaut (bytes)
+        self.columns = {name: bytearray() for name in self.defaults}  # Nom -> lignes des vivants
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, entity):
+        index = getattr(entity, "index", -1)
+        return 0 <= index < len(self.items) and self.items[index] is entity
+
+    def acquire(self, *args, **kwargs):
+        """Renvoie une entité libérée réinitialisée, ou une nouvelle entité si le pool est vide"""
+        if self.free:
+            entity = self.free.pop()
+            entity.reset(*args, **kwargs)
+        else:
+            entity = self.factory(*args, **kwargs)
+            entity.generation = 0
+        self._append(entity, {})
+        return entity
+
+    def adopt(self, entity, **rows):
+        """Ajoute une entité créée ailleurs (par exemple reçue d'un autre processus)
+
+        Les lignes de ses colonnes peuvent être données par nom (ligne par défaut sinon).
+        """
+        entity.generation = 0
+        self._append(entity, rows)
+        return entity
+
+    def row(self, entity, name):
+        """Ligne de l'entité vivante dans la colonne `name`"""
+        assert entity.index >= 0, "ligne d'une entité libérée"
+        width = len(self.defaults[name])
+        return bytes(self.columns[name][entity.index * width:(entity.index + 1) * width])
+
+    def set_row(self, entity, name, data):
+        assert entity.index >= 0, "ligne d'une entité libérée"
+        width = len(self.defaults[name])
+        self.columns[name][entity.index * width:(entity.index + 1) * width] = data
+
+    def release(self, entity):
+        """Retire une entité vivante en O(1) et la place dans la liste libre"""
+        self._retire(entity)
+        last = self.items.pop()
+        for name, column in self.columns.items():
+            width = len(self.defaults[name])
+            if last is not entity:
+                column[entity.index * width:(entity.index + 1) * width] = column[-width:]
+            del column[-width:]
+        if last is not entity:
+            self.items[entity.index] = last
+            last.index = entity.index
+        entity.index = -1
+        entity.generation += 1  # Les poignées existantes deviennent invalides
+        self.free.append(entity)
+
+    def clear(self):
+        for entity in self.items:
+            self._retire(entity)
+        for entity in self.items:
+            entity.index = -1
+            entity.generation += 1
+        self.free.extend(self.items)
+        self.items = []
+        for column in self.columns.values():
+            del column[:]
+
+    def _append(self, entity, rows):
+        entity.index = len(self.items)
+        self.items.append(entity)
+        for name, column in self.columns.items():
+            column.extend(rows.get(name, self.defaults[name]))
+
+    def _retire(self, entity):
+        retire = getattr(entity, "retire", None)
+        if retire is not None:
+            retire()
@@ -0,0 +1,156 @@
+"""Enregistrement vidéo des parties, y compris sans affichage (--record)
+
+Chaque image est dessinée directement dans un emplacement d'un bloc de
+mémoire partagée (pixels BGRA) ; seul le numéro de l'emplacement est envoyé
+aux processus d'encodage, qui lisent les pixels sur place. La simulation
+continue pendant l'encodage et n'attend que si tous les emplacements sont
+encore en cours d'encodage.
+
+Deux sorties : une suite d'images PNG dans un dossier (plusieurs processus,
+encodeur PNG de la bibliothèque standard), ou une vidéo encodée par ffmpeg
+(un seul processus qui lui transmet les images dans l'ordre).
+"""
+import multiprocessing
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import zlib
+from multiprocessing import shared_memory
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".mov", ".avi")
+SLOTS_PER_WORKER = 3  # Images d'avance par processus d'encodage
+PNG_COMPRESSION = 3  # Niveau zlib : les images de la carte se compressent bien même en rapide
+WORKER_CHECK_INTERVAL = 1.0  # Secondes d'attente d'un emplacement entre deux vérifications des encodeurs
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(pixels, width, height):
+    """Encode des pixels BGRA en PNG RGB (sans dépendance externe)"""
+    rgb = bytearray(width * height * 3)
+    rgb[0::3] = pixels[2::4]
+    rgb[1::3] = pixels[1::4]
+    rgb[2::3] = pixels[0::4]
+    stride = width * 3
+    # Chaque ligne est précédée de son type de filtre (0 : aucun)
+    raw = b"".join(b"\x00" + rgb[row:row + stride] for row in range(0, len(rgb), stride))
+    return (b"\x89PNG\r\n\x1a\n" +
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+            _png_chunk(b"IDAT", zlib.compress(raw, PNG_COMPRESSION)) +
+            _png_chunk(b"IEND", b""))
+
+
+def _png_worker(memory_name, width, height, directory, tasks, done):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    frame_size = width * height * 4
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, number = task
+            pixels = memory.buf[slot * frame_size:(slot + 1) * frame_size]
+            data = encode_png(pixels, width, height)
+            pixels.release()
+            done.put(slot)  # L'emplacement peut être réutilisé pendant l'écriture du fichier
+            with open(os.path.join(directory, f"frame_{number:06d}.png"), 'wb') as f:
+                f.write(data)
+    finally:
+        memory.close()
+
+
+def _video_worker(memory_name, width, height, path, fps, tasks, done):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    frame_size = width * height * 4
+    encoder = subprocess.Popen(
+        ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "bgra",
+         "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+         "-c:v", "libx264", "-pix_fmt", "yuv420p", path],
+        stdin=subprocess.PIPE)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, _ = task
+            with memory.buf[slot * frame_size:(slot + 1) * frame_size] as pixels:
+                encoder.stdin.write(pixels)
+            done.put(slot)
+    finally:
+        encoder.stdin.close()
+        encoder.wait()
+        memory.close()
+
+
+class FrameRecorder:
+    def __init__(self, output, width, height, workers=None, fps=30):
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 4
+        self.frames = 0
+        video = output.lower().endswith(VIDEO_EXTENSIONS)
+        if video:
+            if shutil.which("ffmpeg") is None:
+                raise RuntimeError("ffmpeg est introuvable : enregistrer une suite de PNG dans un dossier")
+            workers = 1  # ffmpeg reçoit les images dans l'ordre et encode déjà en parallèle
+        else:
+            os.makedirs(output, exist_ok=True)
+            workers = workers or os.cpu_count() or 1
+
+        slots = workers * SLOTS_PER_WORKER
+        self.memory = shared_memory.SharedMemory(create=True, size=slots * self.frame_size)
+        self.free = list(range(slots))
+        context = multiprocessing.get_context("spawn")
+        self.tasks = context.Queue()
+        self.done = context.Queue()
+        self.processes = []
+        for index in range(workers):
+            if video:
+                args = (self.memory.name, width, height, output, fps, self.tasks, self.done)
+                target = _video_worker
+            else:
+                args = (self.memory.name, width, height, output, self.tasks, self.done)
+                target = _png_worker
+            process = context.Process(target=target, args=args, name=f"recorder-{index}", daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def acquire(self):
+        """Renvoie (emplacement, pixels) d'une image libre ; attend un encodeur si aucune ne l'est
+
+        Les pixels (BGRA) sont une vue sur la mémoire partagée, à libérer
+        avant d'appeler submit().
+        """
+        while not self.free or not self.done.empty():
+            try:
+                self.free.append(self.done.get(timeout=WORKER_CHECK_INTERVAL))
+            except queue.Empty:
+                self._check_workers()
+        slot = self.free.pop()
+        return slot, self.memory.buf[slot * self.frame_size:(slot + 1) * self.frame_size]
+
+    def submit(self, slot):
+        """Confie l'image de l'emplacement aux encodeurs"""
+        self.tasks.put((slot, self.frames))
+        self.frames += 1
+
+    def _check_workers(self):
+        """Lève une erreur si un processus d'encodage s'est arrêté (l'attente ne finirait jamais)"""
+        for process in self.processes:
+            if not process.is_alive():
+                self.close()  # Les autres encodeurs terminent leurs images, la mémoire partagée est rendue
+                raise RuntimeError(f"le processus d'encodage {process.name} s'est arrêté "
+                                   f"(code de sortie {process.exitcode})")
+
+    def close(self):
+        """Attend la fin de l'encodage de toutes les images soumises"""
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.memory.close()
+        self.memory.unlink()
@@ -0,0 +1,232 @@
+"""Connexité de la carte et graphe de régions pour le routage hiérarchique (HPA*)
+
+La carte est découpée en blocs carrés de CLUSTER_SIZE tuiles. Dans chaque
+bloc, les tuiles marchables reliées entre elles (8 directions, comme
+get_adjacent_tiles) forment un noeud du graphe de régions ; deux noeuds de
+blocs voisins sont reliés s'ils se touchent par au moins une paire de tuiles.
+
+Chaque noeud connaît sa composante connexe : savoir si deux tuiles sont
+reliées se fait en deux lectures de tableaux. Modifier une tuile ne
+reconstruit que son bloc, oublie les chemins en cache qui le traversaient,
+puis renumérote les composantes sur le graphe de régions (quelques centaines
+de noeuds au plus).
+"""
+import heapq
+from array import array
+from collections import deque
+
+from tiles import DIRECTIONS, WALKABLE
+
+CLUSTER_SIZE = 16
+
+
+class RegionMap:
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE):
+        self.grid = grid  # Lignes d'identifiants partagées avec la carte (voir tiles.py)
+        self.rows = len(grid)
+        self.cols = len(grid[0]) if grid else 0
+        self.cluster_size = cluster_size
+
+        self.node_at = [array('i', [-1]) * self.cols for _ in range(self.rows)]  # -1 : non marchable
+        self.cluster_nodes = {}  # (ci, cj) -> noeuds du bloc
+        self.node_cluster = {}  # noeud -> (ci, cj)
+        self.edges = {}  # noeud -> {noeud voisin: (tuile du noeud, tuile du voisin)}
+        self.component = {}  # noeud -> numéro de composante connexe
+        self.next_node = 0
+        self.routes = {}  # (noeud de départ, noeud d'arrivée) -> (noeud suivant, chemin complet)
+        self.route_users = {}  # noeud -> clés de self.routes dont le chemin passe par ce noeud
+
+        clusters = [(ci, cj) for ci in range(-(-self.rows // cluster_size))
+                    for cj in range(-(-self.cols // cluster_size))]
+        for cluster in clusters:
+            self._build_cluster(cluster)
+        for cluster in clusters:
+            self._link_cluster(cluster)
+        self._label_components()
+
+    def region(self, i, j):
+        """Composante connexe de la tuile (None si elle n'est pas marchable)"""
+        if 0 <= i < self.rows and 0 <= j < self.cols:
+            node = self.node_at[i][j]
+            if node >= 0:
+                return self.component[node]
+        return None
+
+    def connected(self, i, j, ti, tj):
+        """Vrai si un chemin marchable relie les deux tuiles"""
+        region = self.region(i, j)
+        return region is not None and region == self.region(ti, tj)
+
+    def same_node(self, i, j, ti, tj):
+        """Vrai si les deux tuiles sont dans le même bloc et reliées à l'intérieur de ce bloc"""
+        return 0 <= self.node_at[i][j] == self.node_at[ti][tj]
+
+    def update_tile(self, i, j):
+        """À appeler après avoir modifié la tuile (i, j) de la carte"""
+        cluster = (i // self.cluster_size, j // self.cluster_size)
+        for node in self.cluster_nodes.pop(cluster, []):
+            for neighbour in self.edges.pop(node):
+                del self.edges[neighbour][node]
+            del self.node_cluster[node]
+            del self.component[node]
+            # Seuls les chemins en cache qui traversaient le bloc sont oubliés
+            for key in list(self.route_users.get(node, ())):
+                self._forget_route(key)
+        self._build_cluster(cluster)
+        self._link_cluster(cluster)
+        self._label_components()
+
+    def next_step(self, i, j, ti, tj):
+        """Prochaine tuile d'un chemin vers (ti, tj), None si la cible est inaccessible
+
+        Le graphe de régions donne le prochain noeud à atteindre ; le chemin
+        jusqu'à son entrée est cherché à l'intérieur du noeud courant.
+        """
+        if not self.connected(i, j, ti, tj) or (i, j) == (ti, tj):
+            return None
+        start = self.node_at[i][j]
+        goal = self.node_at[ti][tj]
+        if start != goal:
+            ti, tj = self.edges[start][self._next_node(start, goal)][1]
+        return self._local_step(start, (i, j), (ti, tj))
+
+    def _cluster_tiles(self, cluster):
+        ci, cj = cluster
+        size = self.cluster_size
+        for i in range(ci * size, min((ci + 1) * size, self.rows)):
+            for j in range(cj * size, min((cj + 1) * size, self.cols)):
+                yield i, j
+
+    def _build_cluster(self, cluster):
+        """Crée un noeud par groupe de tuiles marchables reliées à l'intérieur du bloc"""
+        ci, cj = cluster
+        size = self.cluster_size
+        nodes = []
+        for i, j in self._cluster_tiles(cluster):
+            self.node_at[i][j] = -1
+        for i, j in self._cluster_tiles(cluster):
+            if self.node_at[i][j] >= 0 or not WALKABLE[self.grid[i][j]]:
+                continue
+            node = self.next_node
+            self.next_node += 1
+            nodes.append(node)
+            self.node_cluster[node] = cluster
+            self.edges[node] = {}
+            self.node_at[i][j] = node
+            queue = deque([(i, j)])
+            while queue:
+                qi, qj = queue.popleft()
+                for di, dj in DIRECTIONS:
+                    ni, nj = qi + di, qj + dj
+                    if (ni // size == ci and nj // size == cj and 0 <= ni < self.rows and
+                            0 <= nj < self.cols and self.node_at[ni][nj] < 0 and
+                            WALKABLE[self.grid[ni][nj]]):
+                        self.node_at[ni][nj] = node
+                        queue.append((ni, nj))
+        self.cluster_nodes[cluster] = nodes
+
+    def _link_cluster(self, cluster):
+        """Relie les noeuds du bloc à ceux des blocs voisins (tuiles du bord uniquement)"""
+        ci, cj = cluster
+        size = self.cluster_size
+        i0, j0 = ci * size, cj * size
+        i1, j1 = min(i0 + size, self.rows) - 1, min(j0 + size, self.cols) - 1
+        for i, j in self._cluster_tiles(cluster):
+            node = self.node_at[i][j]
+            if node < 0 or i0 < i < i1 and j0 < j < j1:
+                continue
+            for di, dj in DIRECTIONS:
+                ni, nj = i + di, j + dj
+                if not (0 <= ni < self.rows and 0 <= nj < self.cols):
+                    continue
+                neighbour = self.node_at[ni][nj]
+                if neighbour < 0 or self.node_cluster[neighbour] == cluster:
+                    continue
+                self.edges[node].setdefault(neighbour, ((i, j), (ni, nj)))
+                self.edges[neighbour].setdefault(node, ((ni, nj), (i, j)))
+
+    def _label_components(self):
+        """Numérote les composantes connexes du graphe de régions"""
+        self.component = {}
+        label = 0
+        for start in self.edges:
+            if start in self.component:
+                continue
+            self.component[start] = label
+            stack = [start]
+            while stack:
+                for neighbour in self.edges[stack.pop()]:
+                    if neighbour not in self.component:
+                        self.component[neighbour] = label
+                        stack.append(neighbour)
+            label += 1
+
+    def _next_node(self, start, goal):
+        """Noeud suivant sur le chemin de `start` à `goal` (A* sur le graphe, résultat mis en cache)"""
+        cached = self.routes.get((start, goal))
+        if cached is not None:
+            return cached[0]
+
+        gi, gj = self.node_cluster[goal]
+
+        def estimate(node):
+            ci, cj = self.node_cluster[node]
+            return max(abs(ci - gi), abs(cj - gj))
+
+        came_from = {start: None}
+        cost = {start: 0}
+        frontier = [(estimate(start), start)]
+        while frontier:
+            _, node = heapq.heappop(frontier)
+            if node == goal:
+                break
+            for neighbour in self.edges[node]:
+                new_cost = cost[node] + 1
+                if new_cost < cost.get(neighbour, new_cost + 1):
+                    cost[neighbour] = new_cost
+                    came_from[neighbour] = node
+                    heapq.heappush(frontier, (new_cost + estimate(neighbour), neighbour))
+
+        # Remonter le chemin : chaque noeud traversé connaît désormais son successeur
+        path = [goal]
+        while came_from[path[-1]] is not None:
+            path.append(came_from[path[-1]])
+        path.reverse()
+        for index in range(len(path) - 1):
+            key = (path[index], goal)
+            self._forget_route(key)
+            self.routes[key] = (path[index + 1], path[index:])
+            for node in path[index:]:
+                self.route_users.setdefault(node, set()).add(key)
+        return path[1]
+
+    def _forget_route(self, key):
+        cached = self.routes.pop(key, None)
+        if cached is None:
+            return
+        for node in cached[1]:
+            users = self.route_users[node]
+            users.discard(key)
+            if not users:
+                del self.route_users[node]
+
+    def _local_step(self, node, start, goal):
+        """Premier pas d'un plus court chemin de `start` à `goal` sans sortir du noeud"""
+        came_from = {start: None}
+        queue = deque([start])
+        while queue:
+            i, j = queue.popleft()
+            for di, dj in DIRECTIONS:
+                tile = (i + di, j + dj)
+                if tile in came_from:
+                    continue
+                if tile == goal:
+                    came_from[tile] = (i, j)
+                    while came_from[tile] != start:
+                        tile = came_from[tile]
+                    return tile
+                ni, nj = tile
+                if 0 <= ni < self.rows and 0 <= nj < self.cols and self.node_at[ni][nj] == node:
+                    came_from[tile] = (i, j)
+                    queue.append(tile)
+        return None
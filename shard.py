@@ -0,0 +1,281 @@
+"""Simulation répartie sur plusieurs processus, une région rectangulaire de la carte par processus
+
+Chaque processus de travail fait avancer les villageois et les carottes de sa
+région avec le code habituel de main.py. Entre deux pas, le coordinateur :
+- transmet les villageois qui ont franchi une frontière à la région qui les reçoit ;
+- envoie à chaque région une bande "fantôme" des villageois et des carottes
+  voisins, pour que les collisions de move_to_tile et la recherche de carottes
+  restent correctes près des frontières ;
+- décide de l'apparition des carottes pour toute la carte.
+
+Les couples ne se forment qu'à l'intérieur d'une région : un villageois qui
+change de région abandonne son partenaire (les deux sont libérés), et deux
+villageois de part et d'autre d'une frontière ne se reproduisent jamais
+ensemble. Les règles de reproduction diffèrent donc de celles d'une partie en
+un seul processus (voir l'aide de --shards).
+"""
+import bisect
+import multiprocessing
+import os
+import pickle
+import random
+import time
+
+from tiles import WALKABLE, load_map
+
+GHOST_WIDTH = 2  # Largeur (en tuiles) de la bande de villageois fantômes
+CARROT_GHOST_WIDTH = 16  # Largeur de la bande de carottes visibles depuis les régions voisines
+
+
+class Partition:
+    """Découpage de la carte en shard_rows x shard_cols régions rectangulaires"""
+
+    def __init__(self, rows, cols, shard_rows, shard_cols):
+        self.shard_cols = shard_cols
+        self.row_edges = [k * rows // shard_rows for k in range(1, shard_rows)]
+        self.col_edges = [k * cols // shard_cols for k in range(1, shard_cols)]
+        row_bounds = list(zip([0] + self.row_edges, self.row_edges + [rows]))
+        col_bounds = list(zip([0] + self.col_edges, self.col_edges + [cols]))
+        # (i0, i1, j0, j1) pour chaque région, bornes hautes exclues
+        self.bounds = [(i0, i1, j0, j1) for i0, i1 in row_bounds for j0, j1 in col_bounds]
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def owner(self, i, j):
+        """Indice de la région qui possède la tuile (i, j)"""
+        return bisect.bisect_right(self.row_edges, i) * self.shard_cols + bisect.bisect_right(self.col_edges, j)
+
+    def near(self, index, i, j, width):
+        """Vrai si la tuile est dans la région agrandie de `width` tuiles"""
+        i0, i1, j0, j1 = self.bounds[index]
+        return i0 - width <= i < i1 + width and j0 - width <= j < j1 + width
+
+
+def in_bounds(bounds, i, j):
+    i0, i1, j0, j1 = bounds
+    return i0 <= i < i1 and j0 <= j < j1
+
+
+def on_border(bounds, i, j, width):
+    """Vrai si la tuile de la région est à moins de `width` tuiles de son bord"""
+    i0, i1, j0, j1 = bounds
+    return i < i0 + width or i >= i1 - width or j < j0 + width or j >= j1 - width
+
+
+class Ghost:
+    """Copie en lecture seule d'un villageois d'une région voisine"""
+
+    def __init__(self, tile_i, tile_j, moving):
+        self.tile_i = tile_i
+        self.tile_j = tile_j
+        self.moving = moving
+
+
+class GhostCarrot:
+    """Carotte d'une région voisine, visible pour la répartition de la nourriture"""
+
+    def __init__(self, tile):
+        self.reset(tile)
+
+    def reset(self, tile):
+        self.tile_i, self.tile_j = tile
+
+
+def _sync_ghost_carrots(store, tiles):
+    """Met à jour les carottes fantômes sans recréer celles qui n'ont pas bougé"""
+    wanted = set(tiles)
+    for carrot in list(store):
+        if (carrot.tile_i, carrot.tile_j) not in wanted:
+            store.remove(carrot)  # La carotte a été mangée : sa génération change pour ceux qui la visaient
+    for tile in wanted - set(store.by_tile):
+        store.spawn(tile)
+
+
+def _worker(conn, map_file, bounds, seed):
+    """Boucle d'un processus de travail : fait avancer une région à chaque message reçu"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    import pygame
+    import main as sim
+    from assets import AssetLoader
+
+    random.seed(seed)
+    pygame.init()
+    sim.screen = pygame.display.set_mode((1, 1))
+    loader = AssetLoader()
+    sim.request_sprites(loader)
+    sim.load_map_from_file(map_file)
+    sim.load_sprites(loader)
+
+    sim.genealogy = None  # Les identifiants ne seraient pas uniques entre les processus
+    owned = sim.villagers  # Les bébés y sont ajoutés directement par try_reproduce
+    carrots = sim.CarrotStore()
+    ghost_carrots = sim.CarrotStore(factory=GhostCarrot)
+    particles = sim.Pool(sim.Particle)
+    tick = 0
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        incoming, ghosts, carrot_ghost_tiles, villager_spawns, carrot_spawns = message
+
+        for blob in incoming:
+            v = pickle.loads(blob)
+            owned.adopt(v, genome=vars(v).pop("genome"))
+            sim.census.add(v)
+            sim.matchmaker.refresh(v)
+        for tile in villager_spawns:
+            owned.acquire(owned, spawn_pos=tile)
+        for tile in carrot_spawns:
+            carrots.spawn(tile)
+        _sync_ghost_carrots(ghost_carrots, carrot_ghost_tiles)
+
+        tick += 1
+        if tick % sim.FOOD_ALLOCATION_INTERVAL == 0:
+            sim.allocate_carrots(owned, carrots, ghost_carrots)
+
+        # Les bébés nés pendant le pas rejoignent `owned` mais pas `others` (pas de mise à jour ce pas-ci)
+        others = owned.items + [Ghost(*ghost) for ghost in ghosts]
+        for v in others[:len(owned)]:
+            v.update(others, carrots, particles)
+        particles.clear()  # Rien n'est affiché dans les processus de travail
+
+        # Les villageois sortis de la région sont transmis au coordinateur et rendus au pool
+        outgoing = []
+        for v in reversed(owned.items):
+            if not in_bounds(bounds, v.tile_i, v.tile_j):
+                # Défaire le couple : le partenaire resté ici redevient disponible
+                sim.matchmaker.release(v)
+                sim.matchmaker.pool.remove(v)
+                outgoing.append((v.tile_i, v.tile_j, pickle.dumps(v)))
+                owned.release(v)
+
+        border = [(v.tile_i, v.tile_j, v.moving) for v in owned
+                  if on_border(bounds, v.tile_i, v.tile_j, GHOST_WIDTH)]
+        carrot_border = [(c.tile_i, c.tile_j) for c in carrots
+                         if on_border(bounds, c.tile_i, c.tile_j, CARROT_GHOST_WIDTH)]
+        stats = {
+            "population": len(owned),
+            "babies": sum(1 for v in owned if v.is_baby),
+            "carrots": len(carrots),
+            "births": sim.metrics.births,
+            "carrots_eaten": sim.metrics.carrots_eaten,
+            "search_distance_total": sim.metrics.search_distance_total,
+            "search_count": sim.metrics.search_count,
+        }
+        conn.send((outgoing, border, carrot_border, stats))
+
+    conn.close()
+
+
+def _random_walkable_tile(grid, rows, cols):
+    """Tire une tuile marchable au hasard (100 essais, comme Carrot et Villageois)"""
+    for _ in range(100):
+        i = random.randint(0, rows - 1)
+        j = random.randint(0, cols - 1)
+        if WALKABLE[grid[i][j]]:
+            return i, j
+    return None
+
+
+def run_sharded(map_file, shard_rows, shard_cols, ticks, villagers, metrics,
+                max_carrots, carrot_spawn_interval):
+    """Fait tourner la simulation sans affichage, répartie sur shard_rows x shard_cols processus"""
+    try:
+        grid = load_map(map_file)
+    except OSError as e:
+        print(f"Impossible de charger {map_file} pour le mode réparti: {e}")
+        return
+    if not grid:
+        print(f"Fichier {map_file} vide, le mode réparti a besoin d'une carte")
+        return
+    rows, cols = len(grid), len(grid[0])
+    partition = Partition(rows, cols, shard_rows, shard_cols)
+    count = len(partition)
+
+    # "spawn" : mêmes processus de travail sous Linux, macOS et Windows
+    context = multiprocessing.get_context("spawn")
+    connections = []
+    processes = []
+    for index in range(count):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_worker, name=f"shard-{index}", daemon=True,
+                                  args=(child_conn, map_file, partition.bounds[index], random.getrandbits(32)))
+        process.start()
+        child_conn.close()
+        connections.append(parent_conn)
+        processes.append(process)
+    print(f"Mode réparti: {count} régions ({shard_rows}x{shard_cols}) sur une carte {rows}x{cols}")
+
+    incoming = [[] for _ in range(count)]
+    ghosts = [[] for _ in range(count)]
+    carrot_ghosts = [[] for _ in range(count)]
+    villager_spawns = [[] for _ in range(count)]
+    for _ in range(villagers):
+        tile = _random_walkable_tile(grid, rows, cols)
+        if tile:
+            villager_spawns[partition.owner(*tile)].append(tile)
+
+    stats = [{} for _ in range(count)]
+    metrics.source = lambda: {key: sum(s.get(key, 0) for s in stats)
+                              for key in ("population", "babies", "carrots")}
+
+    carrot_spawn_timer = 0
+    tick = 0
+    try:
+        while not ticks or tick < ticks:
+            frame_start = time.perf_counter()
+            tick += 1
+
+            # Spawn automatique des carottes, décidé pour toute la carte
+            carrot_spawns = [[] for _ in range(count)]
+            carrot_spawn_timer += 1
+            total_carrots = sum(s.get("carrots", 0) for s in stats)
+            if carrot_spawn_timer >= carrot_spawn_interval and total_carrots < max_carrots:
+                tile = _random_walkable_tile(grid, rows, cols)
+                if tile:
+                    carrot_spawns[partition.owner(*tile)].append(tile)
+                    metrics.carrots_spawned += 1
+                carrot_spawn_timer = 0
+
+            # Toutes les régions avancent en parallèle
+            for index, conn in enumerate(connections):
+                conn.send((incoming[index], ghosts[index], carrot_ghosts[index],
+                           villager_spawns[index], carrot_spawns[index]))
+            replies = [conn.recv() for conn in connections]
+
+            # Transferts aux frontières et bandes fantômes pour le pas suivant
+            incoming = [[] for _ in range(count)]
+            ghosts = [[] for _ in range(count)]
+            carrot_ghosts = [[] for _ in range(count)]
+            villager_spawns = [[] for _ in range(count)]
+            for source, (outgoing, border, carrot_border, shard_stats) in enumerate(replies):
+                stats[source] = shard_stats
+                for i, j, blob in outgoing:
+                    incoming[partition.owner(i, j)].append(blob)
+                for index in range(count):
+                    if index == source:
+                        continue
+                    ghosts[index].extend(g for g in border if partition.near(index, g[0], g[1], GHOST_WIDTH))
+                    carrot_ghosts[index].extend(c for c in carrot_border
+                                                if partition.near(index, c[0], c[1], CARROT_GHOST_WIDTH))
+
+            metrics.births = sum(s["births"] for s in stats)
+            metrics.carrots_eaten = sum(s["carrots_eaten"] for s in stats)
+            metrics.search_distance_total = sum(s["search_distance_total"] for s in stats)
+            metrics.search_count = sum(s["search_count"] for s in stats)
+            metrics.record_frame(time.perf_counter() - frame_start)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for conn in connections:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for process in processes:
+            process.join(timeout=5)
+
+    population = sum(s.get("population", 0) for s in stats)
+    print(f"Simulation répartie terminée après {tick} pas. Population: {population}")
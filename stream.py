@@ -0,0 +1,260 @@
+"""Diffusion de l'état de la partie vers des visionneuses distantes (--stream-port, voir viewer.py)
+
+Un serveur asyncio tourne dans un thread du processus de simulation. Chaque
+nouvelle visionneuse reçoit d'abord une image clé (terrain, villageois,
+carottes), puis, à chaque pas diffusé, un delta : villageois apparus ou dont
+la tuile, l'âge ou l'état a changé, villageois disparus, carottes apparues ou
+mangées et tuiles repeintes.
+
+La boucle de simulation ne fait que calculer le delta (une seule fois pour
+toutes les visionneuses) et le confier au thread du serveur. Une visionneuse
+trop lente (plus de HIGH_WATER octets en attente d'envoi) ne reçoit plus de
+deltas ; une nouvelle image clé lui est envoyée dès qu'elle a rattrapé son
+retard.
+
+Format (petit-boutiste) : chaque message est précédé de son type et de sa
+taille (<BI), puis :
+- image clé : pas, lignes, colonnes (<IHH), identifiants du terrain (une
+  ligne après l'autre), villageois, carottes ;
+- delta : pas (<I), villageois modifiés, villageois disparus, carottes
+  apparues, carottes mangées, tuiles repeintes.
+Chaque liste commence par son nombre d'éléments (<I).
+"""
+import asyncio
+import struct
+import threading
+
+MESSAGE_KEYFRAME = 1
+MESSAGE_DELTA = 2
+HIGH_WATER = 1 << 20  # Octets en attente au-delà desquels une visionneuse est jugée en retard
+
+STATES = ["pause", "move"]  # États d'un villageois (attribut state)
+
+_MESSAGE = struct.Struct("<BI")  # Type, taille des données
+_KEYFRAME = struct.Struct("<IHH")  # Pas, lignes, colonnes
+_TICK = struct.Struct("<I")
+_COUNT = struct.Struct("<I")
+_VILLAGER = struct.Struct("<IHHB")  # Identifiant, tuile, drapeaux (bit 0 : bébé, bits suivants : état)
+_UID = struct.Struct("<I")
+_TILE = struct.Struct("<HH")
+_PAINT = struct.Struct("<HHB")  # Tuile, terrain
+
+
+def _pack_list(item, entries):
+    return _COUNT.pack(len(entries)) + b"".join(item.pack(*entry) for entry in entries)
+
+
+def _unpack_list(item, data, offset):
+    count, = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    entries = [item.unpack_from(data, offset + index * item.size) for index in range(count)]
+    return entries, offset + count * item.size
+
+
+def _message(kind, payload):
+    return _MESSAGE.pack(kind, len(payload)) + payload
+
+
+class WorldDelta:
+    """Dernier état diffusé, côté simulation : calcule les deltas et les images clés"""
+
+    def __init__(self):
+        self.tick = 0
+        self.villagers = {}  # Identifiant -> (i, j, drapeaux)
+        self.carrots = set()
+
+    def update(self, tick, villagers, carrot_tiles, painted):
+        """Enregistre l'état courant et renvoie le message delta depuis le dernier appel
+
+        `villagers` : (identifiant, i, j, bébé, état) de chaque villageois ;
+        `painted` : tuiles repeintes depuis le dernier appel [(i, j, terrain)],
+        dans l'ordre (le terrain n'est pas comparé à chaque pas).
+        """
+        current = {uid: (i, j, is_baby | STATES.index(state) << 1) for uid, i, j, is_baby, state in villagers}
+        changed = [(uid,) + entry for uid, entry in current.items() if self.villagers.get(uid) != entry]
+        removed = [(uid,) for uid in self.villagers if uid not in current]
+        carrots = set(carrot_tiles)
+        added_carrots = sorted(carrots - self.carrots)
+        eaten_carrots = sorted(self.carrots - carrots)
+
+        self.tick = tick
+        self.villagers = current
+        self.carrots = carrots
+        return _message(MESSAGE_DELTA, _TICK.pack(tick) + _pack_list(_VILLAGER, changed) +
+                        _pack_list(_UID, removed) + _pack_list(_TILE, added_carrots) +
+                        _pack_list(_TILE, eaten_carrots) + _pack_list(_PAINT, painted))
+
+    def keyframe(self, terrain_map):
+        """Message image clé du dernier état enregistré par update(), avec le terrain actuel"""
+        villagers = [(uid,) + entry for uid, entry in self.villagers.items()]
+        header = _KEYFRAME.pack(self.tick, len(terrain_map), len(terrain_map[0]))
+        return _message(MESSAGE_KEYFRAME, header + b"".join(terrain_map) +
+                        _pack_list(_VILLAGER, villagers) + _pack_list(_TILE, sorted(self.carrots)))
+
+
+class WorldState:
+    """État reconstruit côté visionneuse à partir des messages reçus"""
+
+    def __init__(self):
+        self.tick = 0
+        self.terrain_map = []
+        self.villagers = {}  # Identifiant -> (i, j, bébé, état)
+        self.carrots = set()
+
+    def apply(self, kind, payload):
+        """Applique un message ; renvoie les tuiles repeintes [(i, j, terrain)]"""
+        if kind == MESSAGE_KEYFRAME:
+            self.tick, rows, cols = _KEYFRAME.unpack_from(payload)
+            offset = _KEYFRAME.size
+            self.terrain_map = [bytearray(payload[offset + i * cols:offset + (i + 1) * cols]) for i in range(rows)]
+            offset += rows * cols
+            villagers, offset = _unpack_list(_VILLAGER, payload, offset)
+            carrots, offset = _unpack_list(_TILE, payload, offset)
+            self.villagers = {}
+            self._set_villagers(villagers)
+            self.carrots = set(carrots)
+            return []
+
+        self.tick, = _TICK.unpack_from(payload)
+        offset = _TICK.size
+        changed, offset = _unpack_list(_VILLAGER, payload, offset)
+        removed, offset = _unpack_list(_UID, payload, offset)
+        added_carrots, offset = _unpack_list(_TILE, payload, offset)
+        eaten_carrots, offset = _unpack_list(_TILE, payload, offset)
+        painted, offset = _unpack_list(_PAINT, payload, offset)
+        self._set_villagers(changed)
+        for uid, in removed:
+            del self.villagers[uid]
+        self.carrots.difference_update(eaten_carrots)
+        self.carrots.update(added_carrots)
+        for i, j, tile_id in painted:
+            self.terrain_map[i][j] = tile_id
+        return painted
+
+    def _set_villagers(self, entries):
+        for uid, i, j, flags in entries:
+            self.villagers[uid] = (i, j, bool(flags & 1), STATES[flags >> 1])
+
+
+def read_messages(stream):
+    """Messages (type, données) lus sur un fichier binaire (socket.makefile('rb')) jusqu'à la fermeture"""
+    while True:
+        header = stream.read(_MESSAGE.size)
+        if len(header) < _MESSAGE.size:
+            return
+        kind, size = _MESSAGE.unpack(header)
+        payload = stream.read(size)
+        if len(payload) < size:
+            return
+        yield kind, payload
+
+
+class _Client:
+    def __init__(self, writer, high_water):
+        self.writer = writer
+        self.needs_keyframe = True
+        self.high_water = high_water  # Relevé juste après une image clé, le temps qu'elle parte
+
+    def pending(self):
+        return self.writer.transport.get_write_buffer_size()
+
+
+class StreamServer:
+    def __init__(self, host="127.0.0.1", port=0, high_water=HIGH_WATER):
+        self.host = host
+        self.port = port
+        self.high_water = high_water
+        self.tracker = WorldDelta()
+        self.clients = set()  # Modifié uniquement dans le thread du serveur
+        self.client_count = 0  # Lu par la boucle de simulation
+        self.keyframe_wanted = threading.Event()
+        self.loop = None
+        self.thread = None
+
+    def start(self):
+        """Démarre le serveur dans son thread ; renvoie une fois le port ouvert"""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                server = self.loop.run_until_complete(
+                    asyncio.start_server(self._handle_client, self.host, self.port))
+            except OSError as error:
+                errors.append(error)
+                ready.set()
+                return
+            self.port = server.sockets[0].getsockname()[1]
+            ready.set()
+            try:
+                self.loop.run_forever()
+            finally:
+                server.close()
+                for client in self.clients:
+                    client.writer.close()
+                self.loop.run_until_complete(server.wait_closed())
+                self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="stream-server", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2)
+
+    def has_clients(self):
+        return self.client_count > 0
+
+    def publish(self, tick, terrain_map, villagers, carrot_tiles, painted):
+        """Appelé par la boucle de simulation : calcule le delta et le confie au thread du serveur
+
+        `painted` : tuiles repeintes depuis la dernière diffusion ; le terrain
+        entier n'est lu que pour une image clé.
+        """
+        delta = self.tracker.update(tick, villagers, carrot_tiles, painted)
+        keyframe = None
+        if self.keyframe_wanted.is_set():
+            self.keyframe_wanted.clear()
+            keyframe = self.tracker.keyframe(terrain_map)
+        self.loop.call_soon_threadsafe(self._dispatch, delta, keyframe)
+
+    def _dispatch(self, delta, keyframe):
+        for client in self.clients:
+            pending = client.pending()
+            if pending <= self.high_water:
+                client.high_water = self.high_water
+            if client.needs_keyframe:
+                if pending <= client.high_water:
+                    if keyframe is not None:
+                        client.writer.write(keyframe)
+                        client.needs_keyframe = False
+                        # Une grande carte dépasse à elle seule le seuil : les deltas qui
+                        # suivent l'image clé ne doivent pas la faire juger en retard
+                        client.high_water = max(self.high_water, 2 * len(keyframe))
+                    else:
+                        self.keyframe_wanted.set()  # Retard rattrapé : image clé au prochain pas diffusé
+            elif pending > client.high_water:
+                client.needs_keyframe = True  # Les deltas suivants sont abandonnés pour ce client
+            else:
+                client.writer.write(delta)
+
+    async def _handle_client(self, reader, writer):
+        client = _Client(writer, self.high_water)
+        self.clients.add(client)
+        self.client_count = len(self.clients)
+        self.keyframe_wanted.set()
+        try:
+            # Les visionneuses n'envoient rien : attendre la fermeture de la connexion
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            self.client_count = len(self.clients)
+            writer.close()
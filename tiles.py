@@ -0,0 +1,117 @@
+"""Registre des types de terrain et chargement des cartes (format texte ou binaire)
+
+Chaque terrain reçoit un petit identifiant entier. Les cartes sont stockées
+sous forme de lignes `bytearray` d'identifiants, ce qui permet de les lire
+d'un bloc depuis le format binaire compact.
+"""
+import struct
+import sys
+
+
+class TileType:
+    def __init__(self, tile_id, char, name, walkable=False, movement_cost=1.0, layer="ground",
+                 sprite=None, sprite_scale=1, base=None, fallback_color=(100, 100, 100),
+                 food_capacity=0, food_regrowth=0.0):
+        self.id = tile_id
+        self.char = char
+        self.name = name
+        self.walkable = walkable
+        self.movement_cost = movement_cost  # Divise la vitesse des villageois sur la tuile
+        self.layer = layer  # "ground" (dessiné avec la carte) ou "overlay" (dessiné après les villageois)
+        self.sprite = sprite
+        self.sprite_scale = sprite_scale
+        self.base = base  # Caractère du terrain dessiné sous une tuile "overlay"
+        self.fallback_color = fallback_color
+        # Couche de nourriture (voir food.py) : unités maximales par tuile et repousse par pas
+        self.food_capacity = food_capacity
+        self.food_regrowth = food_regrowth
+
+
+# L'ordre de la liste définit les identifiants (ne pas réordonner : utilisé par le format binaire)
+TILE_TYPES = [
+    TileType(0, '.', "vide"),
+    TileType(1, 'G', "herbe", walkable=True, sprite='img/herbe.png', fallback_color=(34, 139, 34),
+             food_capacity=4, food_regrowth=0.002),
+    TileType(2, 'S', "sable", walkable=True, sprite='img/sable.png', fallback_color=(194, 178, 128)),
+    TileType(3, 'W', "eau", sprite='img/eau.png', fallback_color=(65, 105, 225)),
+    TileType(4, 'R', "roche", walkable=True, sprite='img/roche.png', fallback_color=(139, 69, 19),
+             food_capacity=1, food_regrowth=0.0005),
+    TileType(5, 'T', "arbre", layer="overlay", sprite='img/arbre.png', sprite_scale=4, base='G',
+             fallback_color=(34, 100, 34)),
+    TileType(6, 'B', "bloc", walkable=True, sprite='img/bloc.png', fallback_color=(100, 100, 100)),
+]
+
+TILE_BY_CHAR = {tile.char: tile for tile in TILE_TYPES}
+EMPTY = TILE_BY_CHAR['.'].id
+
+# Tables de correspondance indexées par identifiant (accès direct sans dictionnaire)
+WALKABLE = bytes(tile.walkable for tile in TILE_TYPES)
+MOVEMENT_COST = [tile.movement_cost for tile in TILE_TYPES]
+FOOD_CAPACITY = [tile.food_capacity for tile in TILE_TYPES]
+FOOD_REGROWTH = [tile.food_regrowth for tile in TILE_TYPES]
+
+# Les 8 voisins d'une tuile (i, j), dans l'ordre de get_adjacent_tiles
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+# Table de traduction octet -> identifiant (caractère inconnu = vide)
+_CHAR_TO_ID = bytearray([EMPTY]) * 256
+for _tile in TILE_TYPES:
+    _CHAR_TO_ID[ord(_tile.char)] = _tile.id
+_CHAR_TO_ID = bytes(_CHAR_TO_ID)
+
+# Format binaire : en-tête (magique, version, lignes, colonnes) puis une ligne d'octets par rangée
+MAP_MAGIC = b"HSMAP"
+MAP_VERSION = 1
+_HEADER = struct.Struct("<5sBII")
+
+
+def parse_text_map(data):
+    """Convertit le contenu d'une carte texte (bytes) en lignes d'identifiants"""
+    lines = [line.rstrip() for line in data.splitlines() if line.strip()]
+    if not lines:
+        return []
+    cols = max(len(line) for line in lines)
+    # Compléter avec du vide puis traduire chaque ligne d'un seul coup
+    return [bytearray(line.ljust(cols, b'.').translate(_CHAR_TO_ID)) for line in lines]
+
+
+def parse_binary_map(data):
+    """Convertit le contenu d'une carte binaire en lignes d'identifiants"""
+    magic, version, rows, cols = _HEADER.unpack_from(data)
+    if magic != MAP_MAGIC or version != MAP_VERSION:
+        raise ValueError("format de carte binaire non reconnu")
+    body = memoryview(data)[_HEADER.size:]
+    if len(body) != rows * cols:
+        raise ValueError(f"taille incohérente: {len(body)} octets pour {rows}x{cols}")
+    if body and max(body) >= len(TILE_TYPES):
+        raise ValueError("identifiant de terrain inconnu")
+    return [bytearray(body[i * cols:(i + 1) * cols]) for i in range(rows)]
+
+
+def load_map(filename):
+    """Charge une carte texte ou binaire (détectée par l'en-tête) en une seule lecture"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if data.startswith(MAP_MAGIC):
+        return parse_binary_map(data)
+    return parse_text_map(data)
+
+
+def save_map_binary(filename, grid):
+    """Enregistre une carte (lignes d'identifiants) au format binaire compact"""
+    rows = len(grid)
+    cols = len(grid[0]) if rows else 0
+    with open(filename, 'wb') as f:
+        f.write(_HEADER.pack(MAP_MAGIC, MAP_VERSION, rows, cols))
+        for row in grid:
+            f.write(row)
+
+
+if __name__ == "__main__":
+    # Conversion d'une carte texte en carte binaire : python tiles.py map/map.txt map/map.bin
+    if len(sys.argv) != 3:
+        print("Usage: python tiles.py <carte source> <carte binaire>")
+        sys.exit(1)
+    grid = load_map(sys.argv[1])
+    save_map_binary(sys.argv[2], grid)
+    print(f"Carte convertie: {len(grid)}x{len(grid[0]) if grid else 0} -> {sys.argv[2]}")
@@ -0,0 +1,145 @@
+"""Visionneuse d'une partie diffusée par `main.py --stream-port` (aucune simulation locale)
+
+Reçoit l'image clé puis les deltas (voir stream.py) et dessine le monde avec
+le code isométrique de main.py : carte pré-dessinée, arbres, sprites et zoom.
+"""
+import argparse
+import queue
+import socket
+import threading
+
+import pygame
+
+import main as sim
+from assets import AssetLoader
+from regions import RegionMap
+from stream import MESSAGE_KEYFRAME, WorldState, read_messages
+
+
+def receive(host, port, inbox):
+    """Thread de réception : place chaque message (type, données) dans `inbox`, puis None à la fermeture"""
+    try:
+        with socket.create_connection((host, port)) as connection:
+            for message in read_messages(connection.makefile('rb')):
+                inbox.put(message)
+    except OSError as error:
+        print(f"Connexion impossible à {host}:{port}: {error}")
+    inbox.put(None)
+
+
+def load_world(world):
+    """Remplace la carte de main.py par celle de l'image clé (si elle a changé)"""
+    if [bytes(row) for row in world.terrain_map] == [bytes(row) for row in sim.terrain_map]:
+        return
+    sim.terrain_map = [bytearray(row) for row in world.terrain_map]
+    sim.MAP_ROWS, sim.MAP_COLS = len(sim.terrain_map), len(sim.terrain_map[0])
+    sim.regions = RegionMap(sim.terrain_map)
+    sim.terrain_surface = None
+    sim.zoomed_terrain.clear()
+    sim.set_zoom(sim.view_zoom)
+
+
+def tile_position(i, j, sprite):
+    """Position d'un sprite posé sur la tuile (i, j), comme les villageois et les carottes de main.py"""
+    screen_x, screen_y = sim.iso_to_screen_walkable(i, j)
+    return (screen_x + (sim.target_width - sprite.get_width()) // 2,
+            screen_y + sim.target_height - sprite.get_height())
+
+
+def draw_world(world, font, address):
+    if sim.view_zoom == 1:
+        sim.draw_iso_map()
+    else:
+        sim.draw_zoomed_terrain()
+
+    for i, j in world.carrots:
+        sim.blit_view(sim.carrot_sprite, *tile_position(i, j, sim.carrot_sprite))
+
+    for i, j, is_baby, _ in sorted(world.villagers.values(), key=lambda entry: entry[0] + entry[1]):
+        image = sim.villager_images(is_baby)[0]
+        sim.blit_view(image, *tile_position(i, j, image))
+
+    # Aux zooms réduits, les arbres font partie de la carte pré-dessinée
+    if sim.view_zoom == 1:
+        sim.draw_trees()
+
+    babies = sum(1 for entry in world.villagers.values() if entry[2])
+    lines = [f"{address} | pas {world.tick}",
+             f"Adultes: {len(world.villagers) - babies} | Bébés: {babies} | Carottes: {len(world.carrots)}",
+             f"Zoom: {sim.view_zoom:g} (molette ou +/-)"]
+    for index, text in enumerate(lines):
+        sim.screen.blit(font.render(text, True, (255, 255, 255)), (10, 10 + index * 22))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Visionneuse d'une partie diffusée")
+    parser.add_argument("--host", default="127.0.0.1", help="adresse de la simulation")
+    parser.add_argument("--port", type=int, required=True, help="port de diffusion (--stream-port)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    address = f"{args.host}:{args.port}"
+
+    pygame.init()
+    sim.screen = pygame.display.set_mode((sim.WINDOW_WIDTH, sim.WINDOW_HEIGHT))
+    pygame.display.set_caption(f"Visionneuse - {address}")
+    clock = pygame.time.Clock()
+    loader = AssetLoader()
+    sim.request_sprites(loader)
+    sim.load_sprites(loader)
+    font = pygame.font.SysFont(None, 20)
+
+    inbox = queue.SimpleQueue()
+    threading.Thread(target=receive, args=(args.host, args.port, inbox), name="viewer-receive",
+                     daemon=True).start()
+
+    world = WorldState()
+    started = False
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and started:
+                level = sim.ZOOM_LEVELS.index(sim.view_zoom)
+                if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    sim.set_zoom(sim.ZOOM_LEVELS[max(level - 1, 0)])
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    sim.set_zoom(sim.ZOOM_LEVELS[min(level + 1, len(sim.ZOOM_LEVELS) - 1)])
+            elif event.type == pygame.MOUSEWHEEL and started:
+                level = sim.ZOOM_LEVELS.index(sim.view_zoom) - event.y
+                sim.set_zoom(sim.ZOOM_LEVELS[min(max(level, 0), len(sim.ZOOM_LEVELS) - 1)])
+
+        # Appliquer tous les messages arrivés depuis la dernière image
+        while True:
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                print("Diffusion terminée")
+                running = False
+                break
+            kind, payload = message
+            painted = world.apply(kind, payload)
+            if kind == MESSAGE_KEYFRAME:
+                load_world(world)
+                started = True
+            for i, j, tile_id in painted:
+                sim.set_tile(i, j, tile_id)
+
+        if started:
+            draw_world(world, font, address)
+        else:
+            sim.screen.fill(sim.BACKGROUND_COLOR)
+            sim.screen.blit(font.render(f"Connexion à {address}...", True, (255, 255, 255)), (10, 10))
+        pygame.display.flip()
+        clock.tick(60)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()